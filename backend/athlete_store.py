@@ -0,0 +1,201 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# On-disk copy of each athlete's tokens and activities so batch jobs can run
+# without a live session. An empty value turns persistence off.
+ATHLETE_STORE_DIR = os.getenv("ATHLETE_STORE_DIR", str(Path(__file__).resolve().parent / "data"))
+# Refresh tokens are only written to disk when explicitly enabled; without
+# them batch jobs cannot call Strava (e.g. for kudos) on an athlete's behalf.
+STORE_TOKENS = os.getenv("ATHLETE_STORE_TOKENS", "").lower() in ("1", "true", "yes")
+# Seconds webhook-driven saves are held back so a burst of events costs one write.
+STORE_FLUSH_DELAY_S = float(os.getenv("ATHLETE_STORE_FLUSH_S", "30"))
+
+# athlete id -> (tokens, activities) waiting for the next flush
+_pending: Dict[int, Tuple[Optional[Dict[str, Any]], List[Dict[str, Any]]]] = {}
+_pending_lock = threading.Lock()
+_flush_timer: Optional[threading.Timer] = None
+
+
+def store_enabled() -> bool:
+    return bool(ATHLETE_STORE_DIR)
+
+
+def _athlete_dir(athlete_id: int) -> Path:
+    return Path(ATHLETE_STORE_DIR) / "athletes" / str(athlete_id)
+
+
+def _snapshot_path(athlete_id: int, year: int, activity_type: str) -> Path:
+    return Path(ATHLETE_STORE_DIR) / "wrapped" / str(year) / f"{athlete_id}-{activity_type}.json"
+
+
+def _write_json(path: Path, payload: Any) -> None:
+    # Write-then-rename so readers (and interrupted batch runs) never see half a file.
+    # mkstemp creates the file owner-only (0600), and the rename keeps that mode.
+    path.parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as fh:
+            json.dump(payload, fh, default=str)
+        os.replace(tmp, path)
+    except BaseException:
+        Path(tmp).unlink(missing_ok=True)
+        raise
+
+
+def _read_json(path: Path) -> Optional[Any]:
+    try:
+        with open(path, encoding="utf-8") as fh:
+            return json.load(fh)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return None
+
+
+def activities_fingerprint(activities: List[Dict[str, Any]]) -> str:
+    """Stable hash of the whole simplified activities, used to spot stale snapshots.
+
+    Every stored field is covered, so any edit Wrapped could reflect (elevation,
+    local start time, route, ...) invalidates the snapshot.
+    """
+    canonical = json.dumps(activities, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha1(canonical.encode()).hexdigest()
+
+
+def save_athlete(athlete_id: int, tokens: Optional[Dict[str, Any]], activities: List[Dict[str, Any]]) -> None:
+    if not store_enabled():
+        return
+    folder = _athlete_dir(athlete_id)
+    _write_json(folder / "activities.json", activities)
+    _write_json(folder / "meta.json", {"fingerprint": activities_fingerprint(activities), "count": len(activities)})
+    if tokens:
+        save_tokens(athlete_id, tokens)
+
+
+def save_athlete_later(athlete_id: int, tokens: Optional[Dict[str, Any]], activities: List[Dict[str, Any]]) -> None:
+    """Queue ``save_athlete``; calls for one athlete within the flush delay collapse into one write."""
+    global _flush_timer
+    if not store_enabled():
+        return
+    with _pending_lock:
+        _pending[athlete_id] = (tokens, activities)
+        if _flush_timer is None:
+            _flush_timer = threading.Timer(STORE_FLUSH_DELAY_S, flush_pending)
+            _flush_timer.daemon = True
+            _flush_timer.start()
+
+
+def pending_activities(athlete_id: int) -> Optional[List[Dict[str, Any]]]:
+    """Activities queued by ``save_athlete_later`` and not yet written, if any."""
+    with _pending_lock:
+        queued = _pending.get(athlete_id)
+    return queued[1] if queued else None
+
+
+def flush_pending() -> None:
+    """Write every queued athlete now (also called on shutdown)."""
+    global _flush_timer
+    with _pending_lock:
+        pending = dict(_pending)
+        _pending.clear()
+        if _flush_timer is not None:
+            _flush_timer.cancel()
+            _flush_timer = None
+    for athlete_id, (tokens, activities) in pending.items():
+        # Copy: session lists keep being patched in place while this writes.
+        save_athlete(athlete_id, tokens, list(activities))
+
+
+def save_tokens(athlete_id: int, tokens: Dict[str, Any]) -> None:
+    if not store_enabled():
+        return
+    path = _athlete_dir(athlete_id) / "tokens.json"
+    if STORE_TOKENS:
+        _write_json(path, tokens)
+    else:
+        # Left over from a run with ATHLETE_STORE_TOKENS on.
+        path.unlink(missing_ok=True)
+
+
+def load_tokens(athlete_id: int) -> Optional[Dict[str, Any]]:
+    if not store_enabled() or not STORE_TOKENS:
+        return None
+    return _read_json(_athlete_dir(athlete_id) / "tokens.json")
+
+
+def load_activities(athlete_id: int) -> List[Dict[str, Any]]:
+    return _read_json(_athlete_dir(athlete_id) / "activities.json") or []
+
+
+def load_meta(athlete_id: int) -> Dict[str, Any]:
+    return _read_json(_athlete_dir(athlete_id) / "meta.json") or {}
+
+
+def stored_athlete_ids() -> List[int]:
+    root = Path(ATHLETE_STORE_DIR) / "athletes"
+    if not store_enabled() or not root.is_dir():
+        return []
+    return sorted(int(p.name) for p in root.iterdir() if p.name.isdigit() and (p / "activities.json").exists())
+
+
+def load_best_efforts(athlete_id: int) -> Dict[int, Dict[str, Dict[str, float]]]:
+    """Per-activity best efforts by activity id, kept across sessions since streams never change."""
+    if not store_enabled():
+        return {}
+    stored = _read_json(_athlete_dir(athlete_id) / "best_efforts.json") or {}
+    return {int(activity_id): efforts for activity_id, efforts in stored.items()}
+
+
+def save_best_efforts(athlete_id: int, efforts: Dict[int, Dict[str, Dict[str, float]]]) -> None:
+    """Merge ``efforts`` into the athlete's stored per-activity best efforts."""
+    if not store_enabled() or not efforts:
+        return
+    merged = {**load_best_efforts(athlete_id), **efforts}
+    _write_json(_athlete_dir(athlete_id) / "best_efforts.json", {str(k): v for k, v in merged.items()})
+
+
+def drop_best_efforts(athlete_id: int, activity_ids: List[int]) -> None:
+    stored = load_best_efforts(athlete_id)
+    if any(activity_id in stored for activity_id in activity_ids):
+        for activity_id in activity_ids:
+            stored.pop(activity_id, None)
+        _write_json(_athlete_dir(athlete_id) / "best_efforts.json", {str(k): v for k, v in stored.items()})
+
+
+def load_groups() -> Dict[str, Dict[str, str]]:
+    """Group id -> {athlete id: display name} for opted-in leaderboard members."""
+    if not store_enabled():
+        return {}
+    return _read_json(Path(ATHLETE_STORE_DIR) / "groups.json") or {}
+
+
+def save_groups(groups: Dict[str, Dict[str, str]]) -> None:
+    if store_enabled():
+        _write_json(Path(ATHLETE_STORE_DIR) / "groups.json", groups)
+
+
+def save_wrapped_snapshot(
+    athlete_id: int, year: int, activity_type: str, fingerprint: str, wrapped: Dict[str, Any], kudos: bool
+) -> None:
+    """Store a Wrapped payload; ``kudos=False`` marks it partial (built without kudos lookups)."""
+    if not activity_type.isalnum():
+        raise ValueError(f"Invalid activity type: {activity_type!r}")
+    _write_json(
+        _snapshot_path(athlete_id, year, activity_type),
+        {"fingerprint": fingerprint, "kudos": kudos, "wrapped": wrapped},
+    )
+
+
+def load_wrapped_snapshot(
+    athlete_id: int, year: int, activity_type: str, fingerprint: Optional[str] = None
+) -> Optional[Dict[str, Any]]:
+    """The stored snapshot (``fingerprint``, ``kudos``, ``wrapped``), or None if missing or stale."""
+    if not store_enabled() or not activity_type.isalnum():
+        return None
+    snapshot = _read_json(_snapshot_path(athlete_id, year, activity_type))
+    if not snapshot or (fingerprint is not None and snapshot.get("fingerprint") != fingerprint):
+        return None
+    return snapshot if snapshot.get("wrapped") is not None else None
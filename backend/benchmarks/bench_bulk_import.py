@@ -0,0 +1,134 @@
+"""Throughput benchmark for Strava bulk-export imports.
+
+Generates a synthetic export archive (activities.csv plus GPX/TCX/FIT files,
+some gzipped) in memory and reports parsed files per second for inline
+parsing and for the process pool.
+
+    python benchmarks/bench_bulk_import.py --activities 400 --points 2000
+"""
+import argparse
+import csv
+import gzip
+import io
+import os
+import struct
+import sys
+import time
+import zipfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bulk_import import FIT_EPOCH_OFFSET, import_strava_archive  # noqa: E402
+
+CSV_HEADER = [
+    "Activity ID", "Activity Date", "Activity Name", "Activity Type", "Elapsed Time", "Distance",
+    "Filename", "Elapsed Time", "Moving Time", "Distance", "Average Speed", "Elevation Gain",
+]
+
+
+def _track(rng: np.random.Generator, points: int, start: datetime):
+    lat = 51.5 + np.cumsum(rng.normal(0, 0.00002, points))
+    lng = -0.12 + np.cumsum(rng.normal(0, 0.00003, points))
+    ele = 30 + np.cumsum(rng.normal(0, 0.4, points))
+    times = [start + timedelta(seconds=i) for i in range(points)]
+    return lat, lng, ele, times
+
+
+def _gpx(lat, lng, ele, times) -> bytes:
+    points = "".join(
+        f'<trkpt lat="{la:.6f}" lon="{ln:.6f}"><ele>{e:.1f}</ele><time>{t:%Y-%m-%dT%H:%M:%SZ}</time></trkpt>'
+        for la, ln, e, t in zip(lat, lng, ele, times)
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?><gpx xmlns="http://www.topografix.com/GPX/1/1">'
+        f"<trk><trkseg>{points}</trkseg></trk></gpx>"
+    ).encode()
+
+
+def _tcx(lat, lng, ele, times) -> bytes:
+    points = "".join(
+        f"<Trackpoint><Time>{t:%Y-%m-%dT%H:%M:%SZ}</Time><Position><LatitudeDegrees>{la:.6f}</LatitudeDegrees>"
+        f"<LongitudeDegrees>{ln:.6f}</LongitudeDegrees></Position><AltitudeMeters>{e:.1f}</AltitudeMeters>"
+        f"<DistanceMeters>{i * 3.0:.1f}</DistanceMeters></Trackpoint>"
+        for i, (la, ln, e, t) in enumerate(zip(lat, lng, ele, times))
+    )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<TrainingCenterDatabase xmlns="http://www.garmin.com/xmlschemas/TrainingCenterDatabase/v2">'
+        f'<Activities><Activity Sport="Running"><Lap><Track>{points}</Track></Lap></Activity></Activities>'
+        "</TrainingCenterDatabase>"
+    ).encode()
+
+
+def _fit(lat, lng, ele, times) -> bytes:
+    to_semicircles = 2 ** 31 / 180.0
+    body = bytearray()
+    # Local type 0: record (timestamp, lat, long, altitude, distance).
+    body += struct.pack("<BBBHB", 0x40, 0, 0, 20, 5)
+    body += bytes([253, 4, 0x86, 0, 4, 0x85, 1, 4, 0x85, 2, 2, 0x84, 5, 4, 0x86])
+    for i, (la, ln, e, t) in enumerate(zip(lat, lng, ele, times)):
+        ts = int(t.timestamp()) - FIT_EPOCH_OFFSET
+        body += struct.pack(
+            "<BIiiHI", 0x00, ts, int(la * to_semicircles), int(ln * to_semicircles), int((e + 500) * 5), i * 300
+        )
+    # Local type 1: session (start_time, sport, total_timer_time, total_distance).
+    body += struct.pack("<BBBHB", 0x41, 0, 0, 18, 4)
+    body += bytes([2, 4, 0x86, 5, 1, 0x00, 8, 4, 0x86, 9, 4, 0x86])
+    start = int(times[0].timestamp()) - FIT_EPOCH_OFFSET
+    body += struct.pack("<BIBII", 0x01, start, 1, len(times) * 1000, (len(times) - 1) * 300)
+    header = struct.pack("<BBHI4s", 12, 0x10, 2132, len(body), b".FIT")
+    return header + bytes(body) + b"\x00\x00"
+
+
+def build_archive(activities: int, points: int, seed: int = 0) -> bytes:
+    rng = np.random.default_rng(seed)
+    writers = [("gpx", _gpx), ("gpx.gz", _gpx), ("tcx", _tcx), ("fit.gz", _fit)]
+    buffer = io.BytesIO()
+    rows = io.StringIO()
+    writer = csv.writer(rows)
+    writer.writerow(CSV_HEADER)
+    start = datetime(2024, 1, 1, 7, tzinfo=timezone.utc)
+    with zipfile.ZipFile(buffer, "w", zipfile.ZIP_DEFLATED) as zf:
+        for i in range(activities):
+            ext, render = writers[i % len(writers)]
+            began = start + timedelta(days=i)
+            data = render(*_track(rng, points, began))
+            if ext.endswith(".gz"):
+                data = gzip.compress(data)
+            filename = f"activities/{1000 + i}.{ext}"
+            zf.writestr(filename, data)
+            writer.writerow([
+                1000 + i, began.strftime("%b %d, %Y, %I:%M:%S %p"), f"Morning Run {i}", "Run", points, "",
+                filename, points, "", "", "", "",
+            ])
+        zf.writestr("activities.csv", rows.getvalue())
+    return buffer.getvalue()
+
+
+def run(archive: bytes, workers: int) -> float:
+    started = time.perf_counter()
+    imported = import_strava_archive(io.BytesIO(archive), max_workers=workers)
+    elapsed = time.perf_counter() - started
+    assert all(a.get("summary_polyline") for a in imported), "every generated file should yield a route"
+    return len(imported) / elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--activities", type=int, default=400)
+    parser.add_argument("--points", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    archive = build_archive(args.activities, args.points)
+    print(f"archive: {args.activities} files, {len(archive) / 1e6:.1f} MB, {args.points} points/file")
+    print(f"inline        : {run(archive, 1):8.1f} files/sec")
+    print(f"pool ({args.workers:>2} proc): {run(archive, args.workers):8.1f} files/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""Latency of small requests while large histories are being computed.
+
+Heavy threads repeatedly run compute_trends/compute_wrapped over a large
+synthetic history while a probe thread times compute_summary on a small one,
+first with everything inline and then with heavy calls sent to the process
+pool. Each probe is timed from its scheduled start, so time spent waiting
+for the GIL after waking up counts. Reports p50/p99 probe latency per mode.
+
+    python benchmarks/bench_offload.py --activities 50000 --workers 2
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import offload  # noqa: E402
+from utils import compute_summary  # noqa: E402
+
+TYPES = ["Run", "Ride", "Walk", "Swim"]
+PROBE_INTERVAL_S = 0.005
+
+
+def synthetic_activities(count: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    start = datetime(datetime.utcnow().year, 1, 1, 6)
+    span = max((datetime.utcnow() - start).total_seconds(), 86400)
+    offsets = np.sort(rng.uniform(0, span, count))
+    return [
+        {
+            "id": i + 1,
+            "name": f"Activity {i}",
+            "type": TYPES[i % len(TYPES)],
+            "start_date_local": (start + timedelta(seconds=float(o))).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "start_date": (start + timedelta(seconds=float(o))).strftime("%Y-%m-%dT%H:%M:%SZ"),
+            "distance": float(rng.uniform(2000, 60000)),
+            "moving_time": int(rng.uniform(900, 10800)),
+            "total_elevation_gain": float(rng.uniform(0, 900)),
+            "average_speed": float(rng.uniform(2, 9)),
+            "kudos_count": int(rng.integers(0, 30)),
+            "start_latlng": [51.5 + float(rng.normal(0, 0.05)), -0.12 + float(rng.normal(0, 0.05))],
+            "athlete_count": 1,
+        }
+        for i, o in enumerate(offsets)
+    ]
+
+
+def run_mode(workers: int, heavy_session, small, heavy_threads: int, duration: float):
+    offload.COMPUTE_WORKERS = workers
+    offload.shutdown_pool()
+    if workers:
+        # Warm the pool and the per-worker unpacked copy before measuring.
+        for _ in range(workers):
+            offload.run_compute(heavy_session, "summary")
+
+    stop = threading.Event()
+    heavy_done = [0]
+
+    def heavy():
+        names = ["trends", "wrapped"]
+        i = 0
+        while not stop.is_set():
+            offload.run_compute(heavy_session, names[i % 2])
+            heavy_done[0] += 1
+            i += 1
+
+    threads = [threading.Thread(target=heavy, daemon=True) for _ in range(heavy_threads)]
+    for t in threads:
+        t.start()
+    latencies = []
+    deadline = time.perf_counter() + duration
+    due = time.perf_counter()
+    while due < deadline:
+        # Measure from when the probe was due, not from when the sleep returned:
+        # waiting to get the GIL back after the sleep is the stall this benchmark is about.
+        # A probe that overran its slot starts the next one right away instead of building a backlog.
+        due = max(due + PROBE_INTERVAL_S, time.perf_counter())
+        time.sleep(max(due - time.perf_counter(), 0))
+        compute_summary(small)
+        latencies.append((time.perf_counter() - due) * 1000)
+    stop.set()
+    for t in threads:
+        t.join()
+    return np.percentile(latencies, 50), np.percentile(latencies, 99), len(latencies), heavy_done[0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--activities", type=int, default=50000)
+    parser.add_argument("--workers", type=int, default=max(1, (os.cpu_count() or 2) - 1))
+    parser.add_argument("--heavy-threads", type=int, default=2)
+    parser.add_argument("--duration", type=float, default=10.0)
+    args = parser.parse_args()
+
+    heavy_session = {"activities": synthetic_activities(args.activities)}
+    small = synthetic_activities(50, seed=1)
+    offload.OFFLOAD_THRESHOLD = 1000
+    try:
+        for label, workers in (("inline", 0), (f"pool x{args.workers}", args.workers)):
+            p50, p99, probes, heavy = run_mode(workers, heavy_session, small, args.heavy_threads, args.duration)
+            print(f"{label:<10} small p50 {p50:7.2f} ms  p99 {p99:7.2f} ms  ({probes} probes, {heavy} heavy calls)")
+    finally:
+        offload.shutdown_pool()
+        packed = heavy_session.get("packed_activities")
+        if packed is not None:
+            packed.release()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+"""A local stand-in for the parts of the Strava API the backend uses.
+
+Serves the OAuth token endpoint, paginated ``/athlete/activities``, activity
+detail, streams and kudos with configurable latency, page counts and
+rate-limit headers. Point the backend at it with::
+
+    STRAVA_OAUTH_BASE=http://127.0.0.1:8099/oauth
+    STRAVA_API_BASE=http://127.0.0.1:8099/api/v3
+
+and run it standalone with ``python benchmarks/fake_strava.py --port 8099``.
+"""
+import argparse
+import hashlib
+import json
+import random
+import threading
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+TYPES = ["Run", "Ride", "Run", "Walk", "Ride", "Swim"]
+FIRST_NAMES = ["Alex", "Sam", "Jo", "Chris", "Robin", "Kim", "Pat", "Max"]
+
+
+@dataclass
+class FakeStravaConfig:
+    pages: int = 3
+    per_page: int = 100
+    latency_ms: float = 0.0
+    kudos_per_activity: int = 5
+    # Requests allowed per 15-minute window before answering 429; 0 disables enforcement.
+    rate_limit: int = 0
+    daily_limit: int = 0
+
+
+def _activity_id(athlete_id: int, index: int) -> int:
+    return athlete_id * 1_000_000 + index
+
+
+def _polyline(rng: random.Random) -> str:
+    lat, lng = 51.5 + rng.uniform(-0.05, 0.05), -0.12 + rng.uniform(-0.05, 0.05)
+    points = [(lat + i * rng.uniform(-0.001, 0.001), lng + i * rng.uniform(-0.001, 0.001)) for i in range(20)]
+    out: List[str] = []
+    prev = (0, 0)
+    for point in points:
+        scaled = (round(point[0] * 1e5), round(point[1] * 1e5))
+        for value, last in zip(scaled, prev):
+            delta = value - last
+            delta = ~(delta << 1) if delta < 0 else delta << 1
+            while delta >= 0x20:
+                out.append(chr((0x20 | (delta & 0x1F)) + 63))
+                delta >>= 5
+            out.append(chr(delta + 63))
+        prev = scaled
+    return "".join(out)
+
+
+def athlete_id_for_code(code: str) -> int:
+    return zlib.crc32(code.encode()) % 900_000 + 100_000
+
+
+def make_activity(athlete_id: int, index: int, total: int) -> Dict[str, Any]:
+    rng = random.Random(_activity_id(athlete_id, index))
+    start_of_year = datetime.utcnow().replace(month=1, day=1, hour=6, minute=0, second=0, microsecond=0)
+    span = max((datetime.utcnow() - start_of_year).total_seconds(), 3600)
+    if index < total:
+        started = start_of_year + timedelta(seconds=span * (total - index) / (total + 1))
+    else:
+        # Activities past the listed history are "new" uploads, e.g. for webhook events.
+        started = datetime.utcnow() - timedelta(hours=1)
+    activity_type = TYPES[index % len(TYPES)]
+    distance = rng.uniform(3000, 60000 if activity_type == "Ride" else 21000)
+    speed = rng.uniform(6, 9) if activity_type == "Ride" else rng.uniform(2.5, 4)
+    polyline = _polyline(rng)
+    return {
+        "id": _activity_id(athlete_id, index),
+        "name": f"{['Morning', 'Lunch', 'Evening'][index % 3]} {activity_type}",
+        "type": activity_type,
+        "start_date": started.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "start_date_local": started.strftime("%Y-%m-%dT%H:%M:%SZ"),
+        "distance": round(distance, 1),
+        "moving_time": int(distance / speed),
+        "total_elevation_gain": round(rng.uniform(0, 800), 1),
+        "average_speed": round(speed, 3),
+        "kudos_count": rng.randint(0, 25),
+        "start_latlng": [51.5, -0.12],
+        "athlete_count": rng.randint(1, 4),
+        "map": {"summary_polyline": polyline},
+    }
+
+
+class FakeStravaServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], config: FakeStravaConfig) -> None:
+        super().__init__(address, FakeStravaHandler)
+        self.config = config
+        self.lock = threading.Lock()
+        self.window_start = time.time()
+        self.window_requests = 0
+        self.daily_requests = 0
+        self.request_count = 0
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def count_request(self) -> Tuple[bool, Dict[str, str]]:
+        with self.lock:
+            now = time.time()
+            if now - self.window_start >= 900:
+                self.window_start, self.window_requests = now, 0
+            self.window_requests += 1
+            self.daily_requests += 1
+            self.request_count += 1
+            cfg = self.config
+            headers = {
+                "X-RateLimit-Limit": f"{cfg.rate_limit or 600},{cfg.daily_limit or 30000}",
+                "X-RateLimit-Usage": f"{self.window_requests},{self.daily_requests}",
+            }
+            limited = (cfg.rate_limit and self.window_requests > cfg.rate_limit) or (
+                cfg.daily_limit and self.daily_requests > cfg.daily_limit
+            )
+            return bool(limited), headers
+
+
+class FakeStravaHandler(BaseHTTPRequestHandler):
+    server: FakeStravaServer
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002
+        pass
+
+    def _send(self, status: int, body: Any, headers: Optional[Dict[str, str]] = None) -> None:
+        payload = json.dumps(body).encode()
+        etag = f'"{hashlib.sha1(payload).hexdigest()[:16]}"'
+        if status == 200 and self.headers.get("If-None-Match") == etag:
+            status, payload = 304, b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        if status in (200, 304):
+            self.send_header("ETag", etag)
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def _athlete_from_auth(self) -> Optional[int]:
+        auth = self.headers.get("Authorization", "")
+        token = auth.replace("Bearer ", "", 1)
+        if not token.startswith("fake-"):
+            return None
+        return int(token.split("-")[1])
+
+    def _begin(self) -> Optional[Dict[str, str]]:
+        if self.server.config.latency_ms:
+            time.sleep(self.server.config.latency_ms / 1000)
+        limited, headers = self.server.count_request()
+        if limited:
+            self._send(429, {"message": "Rate Limit Exceeded"}, headers)
+            return None
+        return headers
+
+    def do_POST(self) -> None:  # noqa: N802
+        headers = self._begin()
+        if headers is None:
+            return
+        length = int(self.headers.get("Content-Length", 0))
+        form = parse_qs(self.rfile.read(length).decode())
+        if urlparse(self.path).path.endswith("/oauth/token"):
+            code = (form.get("code") or form.get("refresh_token") or ["anon"])[0]
+            athlete_id = athlete_id_for_code(code)
+            self._send(200, {
+                "access_token": f"fake-{athlete_id}-{int(time.time())}",
+                "refresh_token": code,
+                "expires_at": int(time.time()) + 6 * 3600,
+                "athlete": {"id": athlete_id, "firstname": "Load", "lastname": f"Tester {athlete_id}"},
+            }, headers)
+            return
+        self._send(404, {"message": "Not Found"}, headers)
+
+    def do_GET(self) -> None:  # noqa: N802
+        headers = self._begin()
+        if headers is None:
+            return
+        url = urlparse(self.path)
+        query = {k: v[0] for k, v in parse_qs(url.query).items()}
+        athlete_id = self._athlete_from_auth()
+        if athlete_id is None:
+            self._send(401, {"message": "Authorization Error"}, headers)
+            return
+        parts = url.path.rstrip("/").split("/")
+        cfg = self.server.config
+        total = cfg.pages * cfg.per_page
+
+        if url.path.endswith("/athlete/activities"):
+            page = int(query.get("page", 1))
+            per_page = min(int(query.get("per_page", 30)), cfg.per_page)
+            first = (page - 1) * per_page
+            indices = range(first, min(first + per_page, total))
+            self._send(200, [make_activity(athlete_id, i, total) for i in indices], headers)
+            return
+
+        if len(parts) >= 2 and parts[-2] == "activities" and parts[-1].isdigit():
+            activity_id = int(parts[-1])
+            index = activity_id - athlete_id * 1_000_000
+            if not 0 <= index < total + 1000:
+                self._send(404, {"message": "Record Not Found"}, headers)
+                return
+            self._send(200, make_activity(athlete_id, index, total), headers)
+            return
+
+        if parts[-1] == "kudos":
+            page = int(query.get("page", 1))
+            seed = random.Random(int(parts[-2]))
+            kudos = [
+                {"firstname": seed.choice(FIRST_NAMES), "lastname": f"{chr(65 + i)}."}
+                for i in range(cfg.kudos_per_activity)
+            ]
+            self._send(200, kudos if page == 1 else [], headers)
+            return
+
+        if parts[-1] == "streams":
+            rng = random.Random(int(parts[-2]))
+            size = 1800
+            speeds = [rng.uniform(2.5, 4.0) for _ in range(size)]
+            distance, acc = [], 0.0
+            for v in speeds:
+                distance.append(round(acc, 1))
+                acc += v
+            streams = {
+                "time": {"data": list(range(size))},
+                "distance": {"data": distance},
+                "heartrate": {"data": [rng.randint(120, 175) for _ in range(size)]},
+            }
+            self._send(200, streams, headers)
+            return
+
+        self._send(404, {"message": "Not Found"}, headers)
+
+
+def start_fake_strava(host: str = "127.0.0.1", port: int = 0, config: Optional[FakeStravaConfig] = None) -> FakeStravaServer:
+    server = FakeStravaServer((host, port), config or FakeStravaConfig())
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--per-page", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--kudos", type=int, default=5)
+    parser.add_argument("--rate-limit", type=int, default=0)
+    parser.add_argument("--daily-limit", type=int, default=0)
+    args = parser.parse_args()
+    config = FakeStravaConfig(
+        pages=args.pages,
+        per_page=args.per_page,
+        latency_ms=args.latency_ms,
+        kudos_per_activity=args.kudos,
+        rate_limit=args.rate_limit,
+        daily_limit=args.daily_limit,
+    )
+    server = FakeStravaServer((args.host, args.port), config)
+    print(f"Fake Strava listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
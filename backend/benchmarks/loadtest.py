@@ -0,0 +1,175 @@
+"""Load test one backend instance against a local fake Strava API.
+
+Starts ``fake_strava`` in-process and (unless ``--backend-url`` is given) a
+uvicorn backend pointed at it, then drives simulated users through the real
+flow: ``/api/session`` -> OAuth callback -> summary/trends/highlights/facts
+-> ``/api/wrapped`` -> a few calendar day clicks. Prints throughput and
+latency percentiles per route.
+
+    python benchmarks/loadtest.py --users 200 --concurrency 20 --latency-ms 50
+"""
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_strava import FakeStravaConfig, start_fake_strava  # noqa: E402
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+DASHBOARD_ROUTES = ["/api/summary", "/api/trends", "/api/highlights", "/api/facts"]
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+        self.errors: Dict[str, int] = defaultdict(int)
+
+    def call(self, http: requests.Session, route: str, url: str, **kwargs) -> Optional[requests.Response]:
+        started = time.perf_counter()
+        try:
+            resp = http.get(url, timeout=120, **kwargs)
+        except requests.RequestException:
+            resp = None
+        elapsed = (time.perf_counter() - started) * 1000
+        ok = resp is not None and resp.status_code < 400
+        with self._lock:
+            self.samples[route].append(elapsed)
+            if not ok:
+                self.errors[route] += 1
+        return resp if ok else None
+
+
+def simulate_user(base_url: str, user: int, day_clicks: int, recorder: Recorder) -> None:
+    http = requests.Session()
+    if recorder.call(http, "/api/session", f"{base_url}/api/session") is None:
+        return
+    callback = recorder.call(
+        http, "/auth/strava/callback", f"{base_url}/auth/strava/callback", params={"code": f"user-{user}"},
+        allow_redirects=False,
+    )
+    if callback is None:
+        return
+    trends = None
+    for route in DASHBOARD_ROUTES:
+        resp = recorder.call(http, route, f"{base_url}{route}", params={"activity_type": "All"})
+        if route == "/api/trends" and resp is not None:
+            trends = resp.json()
+    recorder.call(http, "/api/wrapped", f"{base_url}/api/wrapped")
+    days = [point["date"] for point in (trends or {}).get("daily", [])]
+    for date in days[-day_clicks:] if day_clicks else []:
+        recorder.call(http, "/api/day/{date}", f"{base_url}/api/day/{date}")
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_backend(fake_url: str, port: int, workers: int = 1, **extra_env: str) -> subprocess.Popen:
+    env = dict(
+        os.environ,
+        **extra_env,
+        STRAVA_CLIENT_ID="loadtest",
+        STRAVA_CLIENT_SECRET="loadtest",
+        STRAVA_REDIRECT_URI=f"http://127.0.0.1:{port}/auth/strava/callback",
+        STRAVA_OAUTH_BASE=f"{fake_url}/oauth",
+        STRAVA_API_BASE=f"{fake_url}/api/v3",
+    )
+    cmd = [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"]
+    if workers > 1:
+        cmd += ["--workers", str(workers)]
+    proc = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env)
+    deadline = time.time() + 30
+    while time.time() < deadline:
+        try:
+            requests.get(f"http://127.0.0.1:{port}/api/session", timeout=1)
+            return proc
+        except requests.RequestException:
+            time.sleep(0.2)
+    proc.terminate()
+    raise RuntimeError("backend did not start")
+
+
+def report(recorder: Recorder, wall: float) -> None:
+    header = f"{'route':<24}{'reqs':>7}{'errors':>8}{'req/s':>9}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'max ms':>10}"
+    print(header)
+    print("-" * len(header))
+    total = 0
+    rows: List[Tuple[str, List[float]]] = sorted(recorder.samples.items())
+    for route, samples in rows:
+        arr = np.array(samples)
+        total += arr.size
+        p50, p90, p99 = np.percentile(arr, [50, 90, 99])
+        print(
+            f"{route:<24}{arr.size:>7}{recorder.errors[route]:>8}{arr.size / wall:>9.1f}"
+            f"{p50:>10.1f}{p90:>10.1f}{p99:>10.1f}{arr.max():>10.1f}"
+        )
+    print("-" * len(header))
+    print(f"{'total':<24}{total:>7}{sum(recorder.errors.values()):>8}{total / wall:>9.1f}   wall {wall:.1f}s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--day-clicks", type=int, default=3)
+    parser.add_argument("--backend-url", help="Use an already running backend instead of starting one")
+    parser.add_argument("--backend-workers", type=int, default=1)
+    parser.add_argument("--fake-port", type=int, default=0)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--per-page", type=int, default=100)
+    parser.add_argument("--latency-ms", type=float, default=0.0)
+    parser.add_argument("--kudos", type=int, default=5)
+    parser.add_argument("--rate-limit", type=int, default=0)
+    args = parser.parse_args()
+
+    fake = start_fake_strava(
+        port=args.fake_port,
+        config=FakeStravaConfig(
+            pages=args.pages,
+            per_page=args.per_page,
+            latency_ms=args.latency_ms,
+            kudos_per_activity=args.kudos,
+            rate_limit=args.rate_limit,
+        ),
+    )
+    backend: Optional[subprocess.Popen] = None
+    base_url = args.backend_url
+    if not base_url:
+        port = _free_port()
+        backend = start_backend(fake.base_url, port, args.backend_workers)
+        base_url = f"http://127.0.0.1:{port}"
+
+    print(f"fake strava {fake.base_url}, backend {base_url}, {args.users} users x {args.concurrency} concurrent")
+    recorder = Recorder()
+    started = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+            for user in range(args.users):
+                pool.submit(simulate_user, base_url, user, args.day_clicks, recorder)
+        wall = time.perf_counter() - started
+        report(recorder, wall)
+        print(f"fake strava served {fake.request_count} requests")
+    finally:
+        if backend is not None:
+            backend.terminate()
+            backend.wait(timeout=10)
+        fake.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+"""Post synthetic Strava webhook events to a running backend.
+
+    python benchmarks/webhook_events.py --backend-url http://127.0.0.1:8000 \\
+        --owner-id 12345 --activity-id 67890 --aspect create
+
+``--validate`` runs the subscription handshake first (needs the backend's
+``STRAVA_WEBHOOK_VERIFY_TOKEN``). ``--demo`` needs no running services: it
+starts the fake Strava API and a backend, logs a user in, then sends
+create/update/delete events and checks the session's activities follow them.
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+from typing import Any, Dict
+
+import requests
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from fake_strava import FakeStravaConfig, athlete_id_for_code, start_fake_strava  # noqa: E402
+from loadtest import _free_port, start_backend  # noqa: E402
+
+
+def make_event(
+    owner_id: int, activity_id: int, aspect: str, object_type: str = "activity", subscription_id: int = 1
+) -> Dict[str, Any]:
+    return {
+        "aspect_type": aspect,
+        "event_time": int(time.time()),
+        "object_id": activity_id,
+        "object_type": object_type,
+        "owner_id": owner_id,
+        "subscription_id": subscription_id,
+        "updates": {"title": "Renamed by webhook"} if aspect == "update" else {},
+    }
+
+
+def validate(base_url: str, verify_token: str) -> None:
+    params = {"hub.mode": "subscribe", "hub.verify_token": verify_token, "hub.challenge": "synthetic-challenge"}
+    resp = requests.get(f"{base_url}/webhooks/strava", params=params, timeout=10)
+    resp.raise_for_status()
+    assert resp.json() == {"hub.challenge": "synthetic-challenge"}, resp.text
+    print("validation handshake ok")
+
+
+def post(base_url: str, event: Dict[str, Any]) -> None:
+    started = time.perf_counter()
+    resp = requests.post(f"{base_url}/webhooks/strava", json=event, timeout=10)
+    resp.raise_for_status()
+    elapsed = (time.perf_counter() - started) * 1000
+    print(f"{event['aspect_type']:>6} activity {event['object_id']} -> {resp.status_code} in {elapsed:.1f} ms")
+
+
+def _wait_for(check, timeout: float = 10.0) -> bool:
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if check():
+            return True
+        time.sleep(0.1)
+    return False
+
+
+def demo() -> None:
+    config = FakeStravaConfig(pages=1, per_page=50)
+    fake = start_fake_strava(config=config)
+    port = _free_port()
+    backend = start_backend(
+        fake.base_url, port, STRAVA_WEBHOOK_VERIFY_TOKEN="demo-token", STRAVA_WEBHOOK_SUBSCRIPTION_ID="1"
+    )
+    base_url = f"http://127.0.0.1:{port}"
+    try:
+        validate(base_url, "demo-token")
+        http = requests.Session()
+        http.get(f"{base_url}/api/session", timeout=10)
+        http.get(f"{base_url}/auth/strava/callback", params={"code": "webhook-demo"}, allow_redirects=False, timeout=30)
+        owner_id = athlete_id_for_code("webhook-demo")
+        new_id = owner_id * 1_000_000 + config.pages * config.per_page
+
+        def count() -> int:
+            return http.get(f"{base_url}/api/summary", timeout=10).json()["activities_count"]
+
+        before = count()
+        post(base_url, make_event(owner_id, new_id, "create"))
+        assert _wait_for(lambda: count() == before + 1), "create was not applied"
+        print(f"create applied: {before} -> {before + 1} activities")
+
+        post(base_url, make_event(owner_id, new_id, "update"))
+        today = time.strftime("%Y-%m-%d", time.gmtime(time.time() - 3600))
+        assert _wait_for(
+            lambda: any(a["id"] == new_id for a in http.get(f"{base_url}/api/day/{today}", timeout=10).json())
+        ), "updated activity missing"
+        print("update applied")
+
+        post(base_url, make_event(owner_id, new_id, "delete"))
+        assert _wait_for(lambda: count() == before), "delete was not applied"
+        print(f"delete applied: back to {before} activities")
+    finally:
+        backend.terminate()
+        backend.wait(timeout=10)
+        fake.shutdown()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--owner-id", type=int)
+    parser.add_argument("--activity-id", type=int)
+    parser.add_argument("--aspect", choices=["create", "update", "delete"], default="create")
+    parser.add_argument("--count", type=int, default=1, help="Send this many events with consecutive activity ids")
+    parser.add_argument(
+        "--subscription-id", type=int, default=1, help="Must match the backend's STRAVA_WEBHOOK_SUBSCRIPTION_ID"
+    )
+    parser.add_argument("--validate", metavar="VERIFY_TOKEN")
+    parser.add_argument("--demo", action="store_true")
+    args = parser.parse_args()
+
+    if args.demo:
+        demo()
+        return
+    if args.validate:
+        validate(args.backend_url, args.validate)
+    if args.owner_id is None or args.activity_id is None:
+        if not args.validate:
+            parser.error("--owner-id and --activity-id are required unless --demo or --validate is used")
+        return
+    for i in range(args.count):
+        event = make_event(args.owner_id, args.activity_id + i, args.aspect, subscription_id=args.subscription_id)
+        post(args.backend_url, event)
+
+
+if __name__ == "__main__":
+    main()
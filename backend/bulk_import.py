@@ -0,0 +1,484 @@
+import csv
+import io
+import os
+import struct
+import zipfile
+import zlib
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, BinaryIO, Deque, Dict, Iterator, List, Optional, Tuple
+from xml.etree import ElementTree
+
+import numpy as np
+
+from route_density import encode_polyline
+from utils import simplify_activity
+
+# Below this many files the process pool costs more to start than it saves.
+MIN_FILES_FOR_POOL = 16
+MAX_POLYLINE_POINTS = 400
+# Members (and gzip payloads) that would inflate past this are skipped, so one
+# zip or gzip bomb cannot exhaust a worker's memory.
+MAX_FILE_BYTES = int(float(os.getenv("IMPORT_MAX_FILE_MB", "64")) * 1024 * 1024)
+# Gaps longer than this (seconds) between samples are treated as pauses.
+MAX_MOVING_GAP_S = 30
+MIN_MOVING_SPEED_MS = 0.3
+EARTH_RADIUS_M = 6371008.8
+
+FIT_EPOCH_OFFSET = 631065600
+FIT_SPORTS = {1: "Run", 2: "Ride", 5: "Swim", 11: "Walk", 17: "Hike"}
+TCX_SPORTS = {"running": "Run", "biking": "Ride"}
+_FIT_BASE_TYPES = {
+    0x00: "B", 0x01: "b", 0x02: "B", 0x03: "h", 0x04: "H", 0x05: "i", 0x06: "I", 0x08: "f",
+    0x09: "d", 0x0A: "B", 0x0B: "H", 0x0C: "I", 0x0D: "B", 0x0E: "q", 0x0F: "Q", 0x10: "Q",
+}
+_FIT_INVALID = {"B": 0xFF, "b": 0x7F, "h": 0x7FFF, "H": 0xFFFF, "i": 0x7FFFFFFF, "I": 0xFFFFFFFF}
+_FIT_RECORD = 20
+_FIT_SESSION = 18
+_FIT_ACTIVITY = 34
+_FIT_MESSAGES = (_FIT_RECORD, _FIT_SESSION, _FIT_ACTIVITY)
+
+
+class ArchiveError(Exception):
+    pass
+
+
+# Anything a truncated or malformed member can raise while being decompressed or parsed.
+_PARSE_ERRORS = (
+    ElementTree.ParseError, ArchiveError, struct.error, IndexError, ValueError, KeyError, TypeError,
+    OSError, EOFError, zlib.error,
+)
+
+
+def _local_name(tag: str) -> str:
+    return tag.rsplit("}", 1)[-1]
+
+
+def _parse_iso(value: str) -> Optional[float]:
+    try:
+        parsed = datetime.fromisoformat(value.strip().replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _local_offset(value: str) -> Optional[float]:
+    """Seconds east of UTC for timestamps written with a numeric offset; ``Z`` or none says nothing."""
+    value = value.strip()
+    if value.endswith("Z"):
+        return None
+    try:
+        offset = datetime.fromisoformat(value).utcoffset()
+    except ValueError:
+        return None
+    return offset.total_seconds() if offset is not None else None
+
+
+def _summarize_track(
+    times: List[Optional[float]],
+    lats: List[Optional[float]],
+    lngs: List[Optional[float]],
+    elevations: List[Optional[float]],
+    distances: Optional[List[Optional[float]]] = None,
+) -> Dict[str, Any]:
+    summary: Dict[str, Any] = {}
+    valid_times = [t for t in times if t is not None]
+    if valid_times:
+        summary["start_ts"] = valid_times[0]
+        summary["elapsed_time"] = valid_times[-1] - valid_times[0]
+
+    position = np.array(
+        [(la, ln) for la, ln in zip(lats, lngs) if la is not None and ln is not None], dtype=np.float64
+    )
+    if len(position):
+        summary["start_latlng"] = [round(float(position[0, 0]), 6), round(float(position[0, 1]), 6)]
+        summary["end_latlng"] = [round(float(position[-1, 0]), 6), round(float(position[-1, 1]), 6)]
+        step = max(1, -(-len(position) // MAX_POLYLINE_POINTS))
+        sampled = position[::step]
+        if step > 1 and (sampled[-1] != position[-1]).any():
+            sampled = np.vstack([sampled, position[-1:]])
+        summary["summary_polyline"] = encode_polyline(sampled)
+
+    segment: Optional[np.ndarray] = None
+    if distances and any(d is not None for d in distances):
+        cumulative = np.array([d if d is not None else np.nan for d in distances], dtype=np.float64)
+        cumulative = np.fmax.accumulate(np.nan_to_num(cumulative, nan=0.0))
+        summary["distance"] = float(cumulative[-1] - cumulative[0])
+        segment = np.diff(cumulative)
+    elif len(position) > 1:
+        lat = np.radians(position[:, 0])
+        lng = np.radians(position[:, 1])
+        a = np.sin(np.diff(lat) / 2) ** 2 + np.cos(lat[:-1]) * np.cos(lat[1:]) * np.sin(np.diff(lng) / 2) ** 2
+        segment = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(np.clip(a, 0, 1)))
+        summary["distance"] = float(segment.sum())
+
+    if len(valid_times) == len(times) and len(times) > 1 and segment is not None and segment.size == len(times) - 1:
+        dt = np.diff(np.array(times, dtype=np.float64))
+        with np.errstate(divide="ignore", invalid="ignore"):
+            speed = np.where(dt > 0, segment / dt, 0.0)
+        moving = (dt > 0) & (dt <= MAX_MOVING_GAP_S) & (speed >= MIN_MOVING_SPEED_MS)
+        summary["moving_time"] = float(dt[moving].sum())
+
+    ele = np.array([e for e in elevations if e is not None], dtype=np.float64)
+    if ele.size > 1:
+        gain = np.diff(ele)
+        summary["total_elevation_gain"] = float(gain[gain > 0].sum())
+    return summary
+
+
+def _parse_gpx(data: bytes) -> Dict[str, Any]:
+    times: List[Optional[float]] = []
+    lats: List[Optional[float]] = []
+    lngs: List[Optional[float]] = []
+    elevations: List[Optional[float]] = []
+    offset: Optional[float] = None
+    for _, elem in ElementTree.iterparse(io.BytesIO(data)):
+        if _local_name(elem.tag) != "trkpt":
+            continue
+        point_time: Optional[float] = None
+        point_ele: Optional[float] = None
+        for child in elem:
+            name = _local_name(child.tag)
+            if name == "time" and child.text:
+                point_time = _parse_iso(child.text)
+                if offset is None and point_time is not None:
+                    offset = _local_offset(child.text)
+            elif name == "ele" and child.text:
+                point_ele = float(child.text)
+        lats.append(float(elem.get("lat")))
+        lngs.append(float(elem.get("lon")))
+        times.append(point_time)
+        elevations.append(point_ele)
+        elem.clear()
+    summary = _summarize_track(times, lats, lngs, elevations)
+    if offset is not None:
+        summary["utc_offset"] = offset
+    return summary
+
+
+def _parse_tcx(data: bytes) -> Dict[str, Any]:
+    times: List[Optional[float]] = []
+    lats: List[Optional[float]] = []
+    lngs: List[Optional[float]] = []
+    elevations: List[Optional[float]] = []
+    distances: List[Optional[float]] = []
+    sport: Optional[str] = None
+    offset: Optional[float] = None
+    for _, elem in ElementTree.iterparse(io.BytesIO(data)):
+        name = _local_name(elem.tag)
+        if name == "Activity" and sport is None:
+            sport = TCX_SPORTS.get((elem.get("Sport") or "").lower())
+        if name != "Trackpoint":
+            continue
+        values: Dict[str, str] = {}
+        for child in elem.iter():
+            if child.text:
+                values[_local_name(child.tag)] = child.text
+        times.append(_parse_iso(values["Time"]) if "Time" in values else None)
+        if offset is None and times[-1] is not None:
+            offset = _local_offset(values["Time"])
+        lats.append(float(values["LatitudeDegrees"]) if "LatitudeDegrees" in values else None)
+        lngs.append(float(values["LongitudeDegrees"]) if "LongitudeDegrees" in values else None)
+        elevations.append(float(values["AltitudeMeters"]) if "AltitudeMeters" in values else None)
+        distances.append(float(values["DistanceMeters"]) if "DistanceMeters" in values else None)
+        elem.clear()
+    summary = _summarize_track(times, lats, lngs, elevations, distances)
+    if sport:
+        summary["type"] = sport
+    if offset is not None:
+        summary["utc_offset"] = offset
+    return summary
+
+
+def _read_fit_messages(data: bytes) -> Iterator[Tuple[int, Dict[int, Any]]]:
+    """Yield ``(global_message_number, {field_number: value})`` for record, session and activity messages."""
+    if len(data) < 12 or data[8:12] != b".FIT":
+        raise ArchiveError("Not a FIT file")
+    header_size = data[0]
+    end = min(len(data), header_size + struct.unpack_from("<I", data, 4)[0])
+    pos = header_size
+    definitions: Dict[int, Tuple[int, str, List[Tuple[int, int, int]], int]] = {}
+    last_timestamp = 0
+    while pos < end:
+        header = data[pos]
+        pos += 1
+        time_offset: Optional[int] = None
+        if header & 0x80:
+            local = (header >> 5) & 0x03
+            time_offset = header & 0x1F
+        elif header & 0x40:
+            local = header & 0x0F
+            endian = ">" if data[pos + 1] else "<"
+            global_num = struct.unpack_from(endian + "H", data, pos + 2)[0]
+            count = data[pos + 4]
+            pos += 5
+            fields = [tuple(data[pos + 3 * i:pos + 3 * i + 3]) for i in range(count)]
+            pos += 3 * count
+            dev_size = 0
+            if header & 0x20:
+                dev_count = data[pos]
+                dev_size = sum(data[pos + 1 + 3 * i + 1] for i in range(dev_count))
+                pos += 1 + 3 * dev_count
+            definitions[local] = (global_num, endian, fields, dev_size)
+            continue
+        else:
+            local = header & 0x0F
+
+        if local not in definitions:
+            raise ArchiveError("FIT data message without definition")
+        global_num, endian, fields, dev_size = definitions[local]
+        values: Dict[int, Any] = {}
+        for number, size, base_type in fields:
+            if global_num in _FIT_MESSAGES:
+                fmt = _FIT_BASE_TYPES.get(base_type & 0x1F)
+                if fmt and struct.calcsize(fmt) == size:
+                    value = struct.unpack_from(endian + fmt, data, pos)[0]
+                    if value != _FIT_INVALID.get(fmt):
+                        values[number] = value
+            pos += size
+        pos += dev_size
+
+        if 253 in values:
+            last_timestamp = values[253]
+        elif time_offset is not None:
+            timestamp = (last_timestamp & ~0x1F) + time_offset
+            if time_offset < (last_timestamp & 0x1F):
+                timestamp += 0x20
+            last_timestamp = values[253] = timestamp
+        if global_num in _FIT_MESSAGES:
+            yield global_num, values
+
+
+def _parse_fit(data: bytes) -> Dict[str, Any]:
+    semicircle = 180.0 / 2 ** 31
+    times: List[Optional[float]] = []
+    lats: List[Optional[float]] = []
+    lngs: List[Optional[float]] = []
+    elevations: List[Optional[float]] = []
+    distances: List[Optional[float]] = []
+    session: Dict[int, Any] = {}
+    activity: Dict[int, Any] = {}
+    for global_num, values in _read_fit_messages(data):
+        if global_num == _FIT_SESSION:
+            session = values
+            continue
+        if global_num == _FIT_ACTIVITY:
+            activity = values
+            continue
+        times.append(values[253] + FIT_EPOCH_OFFSET if 253 in values else None)
+        lats.append(values[0] * semicircle if 0 in values else None)
+        lngs.append(values[1] * semicircle if 1 in values else None)
+        altitude = values.get(78, values.get(2))
+        elevations.append(altitude / 5 - 500 if altitude is not None else None)
+        distances.append(values[5] / 100 if 5 in values else None)
+
+    summary = _summarize_track(times, lats, lngs, elevations, distances)
+    if 9 in session:
+        summary["distance"] = session[9] / 100
+    if 8 in session:
+        summary["moving_time"] = session[8] / 1000
+    if 7 in session:
+        summary["elapsed_time"] = session[7] / 1000
+    if 22 in session:
+        summary["total_elevation_gain"] = float(session[22])
+    if 2 in session:
+        summary["start_ts"] = session[2] + FIT_EPOCH_OFFSET
+    if session.get(5) in FIT_SPORTS:
+        summary["type"] = FIT_SPORTS[session[5]]
+    # The activity message carries local_timestamp (field 5) next to its UTC timestamp.
+    if 5 in activity and 253 in activity:
+        summary["utc_offset"] = float(activity[5] - activity[253])
+    return summary
+
+
+def _gunzip(data: bytes, limit: int = MAX_FILE_BYTES) -> bytes:
+    """``gzip.decompress`` that stops as soon as the output passes ``limit`` bytes."""
+    chunks: List[bytes] = []
+    size = 0
+    while data:
+        stream = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        chunk = stream.decompress(data, limit - size + 1)
+        size += len(chunk)
+        if size > limit:
+            raise ArchiveError(f"Decompressed file exceeds {limit} bytes")
+        if not stream.eof:
+            raise EOFError("Compressed file ended before the end-of-stream marker was reached")
+        chunks.append(chunk)
+        data = stream.unused_data
+    return b"".join(chunks)
+
+
+def parse_activity_file(filename: str, data: bytes) -> Optional[Dict[str, Any]]:
+    """Summarize one GPX/TCX/FIT file (optionally ``.gz``); runs inside pool workers.
+
+    Returns None when the file is corrupt, so the caller can count it as skipped.
+    """
+    name = filename.lower()
+    try:
+        if name.endswith(".gz"):
+            data = _gunzip(data)
+            name = name[:-3]
+        if name.endswith(".gpx"):
+            return _parse_gpx(data)
+        if name.endswith(".tcx"):
+            # Garmin exports often pad TCX files with leading whitespace.
+            return _parse_tcx(data.lstrip())
+        if name.endswith(".fit"):
+            return _parse_fit(data)
+    except _PARSE_ERRORS:
+        return None
+    return {}
+
+
+def _parse_csv_date(value: str) -> Optional[float]:
+    for fmt in ("%b %d, %Y, %I:%M:%S %p", "%d %b %Y, %H:%M:%S", "%Y-%m-%d %H:%M:%S"):
+        try:
+            return datetime.strptime(value.strip(), fmt).replace(tzinfo=timezone.utc).timestamp()
+        except ValueError:
+            continue
+    return _parse_iso(value) if value else None
+
+
+def _csv_float(row: Dict[str, str], key: str) -> Optional[float]:
+    value = (row.get(key) or "").replace(",", "").strip()
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def _build_activity(row: Dict[str, str], track: Dict[str, Any]) -> Dict[str, Any]:
+    # activities.csv repeats some headers; csv.DictReader keeps the last (SI unit) column.
+    start_ts = track.get("start_ts") or _parse_csv_date(row.get("Activity Date", ""))
+    start_date = (
+        datetime.fromtimestamp(start_ts, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ") if start_ts else None
+    )
+    # Local wall-clock time in Strava's format (with a literal Z), only when the file says where it was.
+    offset = track.get("utc_offset")
+    start_date_local = (
+        datetime.fromtimestamp(start_ts + offset, tz=timezone.utc).strftime("%Y-%m-%dT%H:%M:%SZ")
+        if start_ts and offset is not None
+        else None
+    )
+    distance = _csv_float(row, "Distance")
+    moving_time = _csv_float(row, "Moving Time")
+    elevation = _csv_float(row, "Elevation Gain")
+    average_speed = _csv_float(row, "Average Speed")
+    distance = distance if distance is not None else track.get("distance")
+    moving_time = moving_time if moving_time is not None else track.get("moving_time", track.get("elapsed_time"))
+    if not average_speed and distance and moving_time:
+        average_speed = distance / moving_time
+    activity_id = row.get("Activity ID", "").strip()
+    raw = {
+        "id": int(activity_id) if activity_id.isdigit() else None,
+        "name": row.get("Activity Name") or "Activity",
+        "type": row.get("Activity Type") or track.get("type") or "Ride",
+        "start_date": start_date,
+        "start_date_local": start_date_local,
+        "distance": distance or 0.0,
+        "moving_time": int(moving_time or 0),
+        "total_elevation_gain": elevation if elevation is not None else track.get("total_elevation_gain", 0.0),
+        "average_speed": average_speed,
+        "kudos_count": None,
+        "start_latlng": track.get("start_latlng"),
+        "end_latlng": track.get("end_latlng"),
+        "athlete_count": None,
+        "map": {"summary_polyline": track.get("summary_polyline")},
+    }
+    activity = simplify_activity(raw)
+    # simplify_activity falls back to the UTC start; keep the field empty rather than wrong.
+    activity["start_date_local"] = start_date_local
+    return activity
+
+
+def _find_member(names: Dict[str, str], filename: str) -> Optional[str]:
+    return names.get(filename.strip().lstrip("/").lower())
+
+
+def _read_member(zf: zipfile.ZipFile, member: str) -> Optional[bytes]:
+    # ZipExtFile never returns more than the declared size, so checking it bounds the read.
+    try:
+        if zf.getinfo(member).file_size > MAX_FILE_BYTES:
+            return None
+        return zf.read(member)
+    except (zipfile.BadZipFile, zlib.error, OSError, EOFError):
+        return None
+
+
+def iter_archive_activities(
+    archive: BinaryIO,
+    max_workers: Optional[int] = None,
+    stats: Optional[Dict[str, int]] = None,
+) -> Iterator[Dict[str, Any]]:
+    """Stream normalized activities out of a Strava bulk-export zip.
+
+    Member files are read straight from the zip and parsed in a process pool;
+    at most a few batches are in flight so memory stays bounded on large exports.
+    Corrupt or oversized member files are skipped (counted in
+    ``stats["skipped_files"]``) and their activities keep only the activities.csv
+    fields.
+    """
+    stats = stats if stats is not None else {}
+    stats.setdefault("skipped_files", 0)
+
+    def track_of(parsed: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        if parsed is None:
+            stats["skipped_files"] += 1
+            return {}
+        return parsed
+
+    with zipfile.ZipFile(archive) as zf:
+        names = {info.filename.lower(): info.filename for info in zf.infolist() if not info.is_dir()}
+        csv_name = next((n for key, n in names.items() if key.endswith("activities.csv")), None)
+        if csv_name is None:
+            raise ArchiveError("activities.csv not found in archive")
+        if zf.getinfo(csv_name).file_size > MAX_FILE_BYTES:
+            raise ArchiveError("activities.csv is too large")
+        with zf.open(csv_name) as raw_csv:
+            rows = list(csv.DictReader(io.TextIOWrapper(raw_csv, encoding="utf-8-sig")))
+
+        with_files = sum(1 for row in rows if _find_member(names, row.get("Filename") or ""))
+        workers = max_workers if max_workers is not None else (os.cpu_count() or 1)
+        if workers <= 1 or with_files < MIN_FILES_FOR_POOL:
+            for row in rows:
+                member = _find_member(names, row.get("Filename") or "")
+                track: Dict[str, Any] = {}
+                if member:
+                    data = _read_member(zf, member)
+                    track = track_of(parse_activity_file(member, data) if data is not None else None)
+                yield _build_activity(row, track)
+            return
+
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # (row, future) for a member file, (row, None) without one, (row, False) if unreadable.
+            in_flight: Deque[Tuple[Dict[str, str], Any]] = deque()
+            window = workers * 4
+
+            def finish(done_row: Dict[str, str], done: Any) -> Dict[str, Any]:
+                if done is None:
+                    return _build_activity(done_row, {})
+                return _build_activity(done_row, track_of(done.result() if done is not False else None))
+
+            for row in rows:
+                member = _find_member(names, row.get("Filename") or "")
+                data = _read_member(zf, member) if member else None
+                if member and data is None:
+                    in_flight.append((row, False))
+                else:
+                    in_flight.append((row, pool.submit(parse_activity_file, member, data) if member else None))
+                while len(in_flight) > window:
+                    yield finish(*in_flight.popleft())
+            while in_flight:
+                yield finish(*in_flight.popleft())
+
+
+def import_strava_archive(
+    archive: BinaryIO,
+    max_workers: Optional[int] = None,
+    stats: Optional[Dict[str, int]] = None,
+) -> List[Dict[str, Any]]:
+    activities = iter_archive_activities(archive, max_workers=max_workers, stats=stats)
+    return [a for a in activities if a.get("id") is not None]
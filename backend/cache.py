@@ -1,5 +1,6 @@
+import bisect
 from datetime import datetime
-from typing import Any, Dict
+from typing import Any, Dict, List, Optional, Tuple
 
 CACHE: Dict[str, Dict[str, Any]] = {}
 
@@ -8,15 +9,130 @@ def init_session(session_id: str) -> None:
     if session_id not in CACHE:
         CACHE[session_id] = {
             "tokens": None,
+            "athlete_id": None,
+            "athlete_name": None,
             "activities": [],
             "last_fetched": None,
             "summary": None,
             "trends": None,
             "highlights": None,
             "facts": None,
+            "wrapped": None,
+            "route_density": None,
+            # Loaded from the athlete store on first use.
+            "best_efforts": None,
+            "day_index": None,
+            "distributions": None,
+            "search_index": None,
+            "packed_activities": None,
+            "activity_starts": None,
+            "fingerprint": None,
         }
 
 
 def update_last_fetched(session_id: str) -> None:
     if session_id in CACHE:
         CACHE[session_id]["last_fetched"] = datetime.utcnow()
+
+
+# Dropped whenever activities change; single-activity patches keep day_index and update it in place.
+DERIVED_KEYS = ("summary", "trends", "highlights", "facts", "wrapped", "day_index", "fingerprint")
+# Maintained in place by single-activity patches, so only a full replace resets them.
+INCREMENTAL_KEYS = ("distributions", "search_index", "activity_starts")
+
+
+def invalidate_derived(session_id: str, keep: Tuple[str, ...] = ()) -> None:
+    """Drop aggregates computed from the session's current activity list, except ``keep``."""
+    session = CACHE[session_id]
+    packed = session.get("packed_activities")
+    if packed is not None:
+        packed.release()
+    session["packed_activities"] = None
+    for key in DERIVED_KEYS:
+        if key not in keep:
+            session[key] = None
+
+
+def set_activities(session_id: str, activities: List[Dict[str, Any]]) -> None:
+    """Replace a session's activities and drop aggregates derived from the old list."""
+    CACHE[session_id]["activities"] = activities
+    for key in INCREMENTAL_KEYS:
+        CACHE[session_id][key] = None
+    invalidate_derived(session_id)
+    update_last_fetched(session_id)
+
+
+def _start_key(activity: Dict[str, Any]) -> str:
+    return activity.get("start_date") or ""
+
+
+def _activity_starts(session_id: str) -> Dict[Any, str]:
+    """Activity id -> start date, so an id is located in the sorted list by bisection."""
+    starts = CACHE[session_id].get("activity_starts")
+    if starts is None:
+        activities = CACHE[session_id].get("activities") or []
+        starts = CACHE[session_id]["activity_starts"] = {a.get("id"): _start_key(a) for a in activities}
+    return starts
+
+
+def _find_activity(session_id: str, activity_id: Any) -> Optional[int]:
+    start = _activity_starts(session_id).get(activity_id)
+    if start is None:
+        return None
+    activities = CACHE[session_id].get("activities") or []
+    i = bisect.bisect_left(activities, start, key=_start_key)
+    while i < len(activities) and _start_key(activities[i]) == start:
+        if activities[i].get("id") == activity_id:
+            return i
+        i += 1
+    return None
+
+
+def _patch_activities(
+    session_id: str, removed: Optional[Dict[str, Any]], added: Optional[Dict[str, Any]]
+) -> None:
+    """Apply a one-activity change to the day index in place and drop the other aggregates."""
+    session = CACHE[session_id]
+    day_index = session.get("day_index")
+    if day_index is not None:
+        patched = (removed is None or day_index.apply_activity(removed, -1)) and (
+            added is None or day_index.apply_activity(added, 1)
+        )
+        if not patched:
+            # The day lies outside the index (e.g. past the day it was built); rebuild on demand.
+            session["day_index"] = None
+    invalidate_derived(session_id, keep=("day_index",))
+    update_last_fetched(session_id)
+
+
+def upsert_activity(session_id: str, activity: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Insert or replace one activity by id, keeping the list sorted; returns the replaced activity, if any."""
+    activities = CACHE[session_id].get("activities")
+    if activities is None:
+        activities = CACHE[session_id]["activities"] = []
+    index = _find_activity(session_id, activity.get("id"))
+    previous = None
+    if index is not None and _start_key(activities[index]) == _start_key(activity):
+        previous = activities[index]
+        activities[index] = activity
+    else:
+        if index is not None:
+            previous = activities.pop(index)
+        bisect.insort(activities, activity, key=_start_key)
+    _activity_starts(session_id)[activity.get("id")] = _start_key(activity)
+    _patch_activities(session_id, previous, activity)
+    return previous
+
+
+def remove_activity(session_id: str, activity_id: int) -> Optional[Dict[str, Any]]:
+    index = _find_activity(session_id, activity_id)
+    if index is None:
+        return None
+    removed = CACHE[session_id]["activities"].pop(index)
+    _activity_starts(session_id).pop(activity_id, None)
+    _patch_activities(session_id, removed, None)
+    return removed
+
+
+def sessions_for_athlete(athlete_id: int) -> List[str]:
+    return [sid for sid, session in list(CACHE.items()) if session.get("athlete_id") == athlete_id]
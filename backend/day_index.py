@@ -0,0 +1,229 @@
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+
+@dataclass
+class DaySeries:
+    distance: np.ndarray
+    moving_time: np.ndarray
+    elevation: np.ndarray
+    count: np.ndarray
+
+
+@dataclass
+class RangeTotals:
+    distance: float
+    moving_time: float
+    elevation: float
+    count: int
+    active_days: int
+    days: int
+
+
+class DayIndex:
+    """Dense per-day totals, one slot per calendar day from the first activity to today.
+
+    ``series`` holds one :class:`DaySeries` per activity type plus ``"All"``.
+    Activity ids are kept in CSR form: the ids of day ``i`` are
+    ``ids[id_offsets[i]:id_offsets[i + 1]]``, with ``id_types`` alongside.
+    """
+
+    def __init__(
+        self,
+        start: date,
+        days: int,
+        series: Dict[str, DaySeries],
+        ids: Optional[np.ndarray] = None,
+        id_types: Optional[np.ndarray] = None,
+        id_offsets: Optional[np.ndarray] = None,
+    ) -> None:
+        self.start = start
+        self.days = days
+        self.series = series
+        self.ids = ids if ids is not None else np.empty(0, dtype=np.int64)
+        self.id_types = id_types if id_types is not None else np.empty(0, dtype=str)
+        self.id_offsets = id_offsets if id_offsets is not None else np.zeros(days + 1, dtype=np.int64)
+        self._prefix: Dict[str, np.ndarray] = {}
+
+    def offset(self, day: date) -> int:
+        return (day - self.start).days
+
+    def date_at(self, offset: int) -> date:
+        return self.start + timedelta(days=offset)
+
+    def get(self, activity_type: str = "All") -> DaySeries:
+        series = self.series.get(activity_type or "All")
+        if series is None:
+            zeros = np.zeros(self.days, dtype=np.float64)
+            series = DaySeries(zeros, zeros, zeros, np.zeros(self.days, dtype=np.int32))
+        return series
+
+    def prefix(self, activity_type: str = "All") -> np.ndarray:
+        """Cumulative ``(5, days + 1)`` sums of distance, time, elevation, count and active days."""
+        prefix = self._prefix.get(activity_type)
+        if prefix is None:
+            series = self.get(activity_type)
+            stacked = np.vstack([
+                series.distance,
+                series.moving_time,
+                series.elevation,
+                series.count,
+                series.count > 0,
+            ]).astype(np.float64)
+            prefix = np.zeros((5, self.days + 1), dtype=np.float64)
+            np.cumsum(stacked, axis=1, out=prefix[:, 1:])
+            self._prefix[activity_type] = prefix
+        return prefix
+
+    def ids_between(self, start: date, end: date, activity_type: str = "All") -> Dict[date, List[int]]:
+        """Activity ids per active day in the inclusive ``start``..``end`` range."""
+        lo = min(max(self.offset(start), 0), self.days)
+        hi = min(max(self.offset(end) + 1, 0), self.days)
+        out: Dict[date, List[int]] = {}
+        for offset in np.flatnonzero(np.diff(self.id_offsets[lo:hi + 1])).tolist():
+            first, last = self.id_offsets[lo + offset], self.id_offsets[lo + offset + 1]
+            ids = self.ids[first:last]
+            if activity_type != "All":
+                ids = ids[self.id_types[first:last] == activity_type]
+            if ids.size:
+                out[self.date_at(lo + offset)] = ids.tolist()
+        return out
+
+    def apply_activity(self, activity: Dict[str, Any], sign: int = 1) -> bool:
+        """Add (``sign=1``) or remove (``sign=-1``) one activity in place.
+
+        Only the activity's day bucket in ``"All"`` and its type changes, plus
+        one CSR slot; cached prefix sums of those series are dropped. Returns
+        False, leaving the index untouched, if the day falls outside it.
+        """
+        day = _activity_day(activity)
+        if day is None:
+            return True
+        try:
+            offset = self.offset(date.fromisoformat(day))
+        except ValueError:
+            return True
+        if not 0 <= offset < self.days:
+            return False
+        activity_type = activity.get("type") or ""
+        for key in ("All", activity_type) if activity_type else ("All",):
+            series = self.series.get(key)
+            if series is None:
+                if sign < 0:
+                    continue
+                series = self.series[key] = DaySeries(
+                    np.zeros(self.days), np.zeros(self.days), np.zeros(self.days), np.zeros(self.days, dtype=np.int32)
+                )
+            series.distance[offset] += sign * (activity.get("distance") or 0)
+            series.moving_time[offset] += sign * (activity.get("moving_time") or 0)
+            series.elevation[offset] += sign * (activity.get("total_elevation_gain") or 0)
+            series.count[offset] += sign
+            self._prefix.pop(key, None)
+
+        activity_id = activity.get("id") or 0
+        lo, hi = int(self.id_offsets[offset]), int(self.id_offsets[offset + 1])
+        if sign > 0:
+            if self.id_types.dtype.itemsize < 4 * len(activity_type):
+                self.id_types = self.id_types.astype(f"<U{len(activity_type)}")
+            self.ids = np.insert(self.ids, hi, activity_id)
+            self.id_types = np.insert(self.id_types, hi, activity_type)
+            self.id_offsets[offset + 1:] += 1
+        else:
+            matches = np.flatnonzero(self.ids[lo:hi] == activity_id)
+            if matches.size:
+                self.ids = np.delete(self.ids, lo + matches[0])
+                self.id_types = np.delete(self.id_types, lo + matches[0])
+                self.id_offsets[offset + 1:] -= 1
+        return True
+
+    def range_totals(self, start: date, end: date, activity_type: str = "All") -> RangeTotals:
+        """Totals for the inclusive ``start``..``end`` range in O(1) once the prefix sums exist."""
+        prefix = self.prefix(activity_type)
+        lo = min(max(self.offset(start), 0), self.days)
+        hi = min(max(self.offset(end) + 1, 0), self.days)
+        totals = prefix[:, hi] - prefix[:, lo] if hi > lo else np.zeros(5)
+        return RangeTotals(
+            distance=float(totals[0]),
+            moving_time=float(totals[1]),
+            elevation=float(totals[2]),
+            count=int(round(totals[3])),
+            active_days=int(round(totals[4])),
+            days=max((end - start).days + 1, 0),
+        )
+
+
+def _activity_day(activity: Dict[str, Any]) -> Optional[str]:
+    date_str = activity.get("start_date_local") or activity.get("start_date")
+    return date_str[:10] if date_str else None
+
+
+def build_day_index(activities: List[Dict[str, Any]], today: Optional[date] = None) -> DayIndex:
+    today = today or datetime.utcnow().date()
+    dated = [(a, d) for a in activities if (d := _activity_day(a))]
+    if not dated:
+        return DayIndex(today, 1, {})
+
+    days_arr = np.array([d for _, d in dated], dtype="datetime64[D]")
+    start = min(days_arr.min().item(), today)
+    end = max(days_arr.max().item(), today)
+    n_days = (end - start).days + 1
+    offsets = (days_arr - np.datetime64(start, "D")).astype(np.int64)
+
+    distance = np.array([a.get("distance") or 0 for a, _ in dated], dtype=np.float64)
+    moving_time = np.array([a.get("moving_time") or 0 for a, _ in dated], dtype=np.float64)
+    elevation = np.array([a.get("total_elevation_gain") or 0 for a, _ in dated], dtype=np.float64)
+    types = np.array([a.get("type") or "" for a, _ in dated])
+
+    def bucket(mask: Optional[np.ndarray]) -> DaySeries:
+        idx = offsets if mask is None else offsets[mask]
+
+        def total(values: np.ndarray) -> np.ndarray:
+            return np.bincount(idx, weights=values if mask is None else values[mask], minlength=n_days)
+
+        return DaySeries(
+            distance=total(distance),
+            moving_time=total(moving_time),
+            elevation=total(elevation),
+            count=np.bincount(idx, minlength=n_days).astype(np.int32),
+        )
+
+    series = {"All": bucket(None)}
+    for activity_type in np.unique(types):
+        if activity_type:
+            series[str(activity_type)] = bucket(types == activity_type)
+
+    order = np.argsort(offsets, kind="stable")
+    ids = np.array([a.get("id") or 0 for a, _ in dated], dtype=np.int64)[order]
+    id_offsets = np.zeros(n_days + 1, dtype=np.int64)
+    np.cumsum(series["All"].count, out=id_offsets[1:])
+    return DayIndex(start, n_days, series, ids=ids, id_types=types[order], id_offsets=id_offsets)
+
+
+def ewma(values: np.ndarray, span_days: int, block: int = 128) -> np.ndarray:
+    """Exponentially weighted average with ``alpha = 1 / span_days``.
+
+    Computed block by block in closed form (cumulative sum of rescaled inputs),
+    so only ``len(values) / block`` Python iterations are needed and the
+    rescaling factors stay far from float64 overflow.
+    """
+    alpha = 1.0 / span_days
+    decay = 1.0 - alpha
+    out = np.empty(values.size, dtype=np.float64)
+    powers = decay ** np.arange(block, dtype=np.float64)
+    carry = 0.0
+    for start in range(0, values.size, block):
+        chunk = values[start:start + block]
+        k = chunk.size
+        scaled = np.cumsum(chunk / powers[:k])
+        out[start:start + k] = powers[:k] * (decay * carry + alpha * scaled)
+        carry = out[start + k - 1]
+    return out
+
+
+def rolling_sum(values: np.ndarray, window: int) -> np.ndarray:
+    cumulative = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+    ends = np.arange(1, values.size + 1)
+    return cumulative[ends] - cumulative[np.maximum(ends - window, 0)]
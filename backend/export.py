@@ -0,0 +1,174 @@
+import csv
+import io
+import json
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from utils import build_activity_highlight
+
+# Rows per yielded chunk (CSV/NDJSON) or per record batch / row group (Parquet/Arrow).
+EXPORT_BATCH_ROWS = 5000
+
+# (column, arrow type name); normalized activity fields, then values derived
+# the same way as ``build_activity_highlight``.
+EXPORT_COLUMNS: List[Tuple[str, str]] = [
+    ("id", "int64"),
+    ("name", "string"),
+    ("type", "string"),
+    ("start_date", "string"),
+    ("start_date_local", "string"),
+    ("distance", "float64"),
+    ("moving_time", "int64"),
+    ("total_elevation_gain", "float64"),
+    ("average_speed", "float64"),
+    ("kudos_count", "int64"),
+    ("athlete_count", "int64"),
+    ("start_lat", "float64"),
+    ("start_lng", "float64"),
+    ("end_lat", "float64"),
+    ("end_lng", "float64"),
+    ("summary_polyline", "string"),
+    ("date", "string"),
+    ("distance_km", "float64"),
+    ("elevation_m", "float64"),
+    ("moving_time_minutes", "float64"),
+    ("average_speed_kmh", "float64"),
+    ("pace_min_per_km", "float64"),
+    ("strava_url", "string"),
+]
+COLUMN_NAMES = [name for name, _ in EXPORT_COLUMNS]
+
+EXPORT_FORMATS: Dict[str, Tuple[str, str]] = {
+    "csv": ("text/csv; charset=utf-8", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+ARROW_FORMATS = ("parquet", "arrow")
+
+
+class ExportError(Exception):
+    pass
+
+
+def _point(value: Any) -> Tuple[Optional[float], Optional[float]]:
+    if value and isinstance(value, (list, tuple)) and len(value) >= 2:
+        return float(value[0]), float(value[1])
+    return None, None
+
+
+def export_row(activity: Dict[str, Any]) -> Dict[str, Any]:
+    highlight = build_activity_highlight(activity)
+    start_lat, start_lng = _point(activity.get("start_latlng"))
+    end_lat, end_lng = _point(activity.get("end_latlng"))
+    return {
+        "id": activity.get("id"),
+        "name": activity.get("name"),
+        "type": activity.get("type"),
+        "start_date": activity.get("start_date"),
+        "start_date_local": activity.get("start_date_local"),
+        "distance": activity.get("distance"),
+        "moving_time": activity.get("moving_time"),
+        "total_elevation_gain": activity.get("total_elevation_gain"),
+        "average_speed": activity.get("average_speed"),
+        "kudos_count": activity.get("kudos_count"),
+        "athlete_count": activity.get("athlete_count"),
+        "start_lat": start_lat,
+        "start_lng": start_lng,
+        "end_lat": end_lat,
+        "end_lng": end_lng,
+        "summary_polyline": activity.get("summary_polyline"),
+        "date": highlight.date,
+        "distance_km": highlight.distance_km,
+        "elevation_m": highlight.elevation_m,
+        "moving_time_minutes": highlight.moving_time_minutes,
+        "average_speed_kmh": highlight.average_speed_kmh,
+        "pace_min_per_km": highlight.pace_min_per_km,
+        "strava_url": highlight.strava_url,
+    }
+
+
+def _batches(activities: List[Dict[str, Any]]) -> Iterator[List[Dict[str, Any]]]:
+    for offset in range(0, len(activities), EXPORT_BATCH_ROWS):
+        yield [export_row(a) for a in activities[offset:offset + EXPORT_BATCH_ROWS]]
+
+
+def iter_csv(activities: List[Dict[str, Any]]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=COLUMN_NAMES, lineterminator="\n")
+    writer.writeheader()
+    for rows in _batches(activities):
+        writer.writerows(rows)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode("utf-8")
+
+
+def iter_ndjson(activities: List[Dict[str, Any]]) -> Iterator[bytes]:
+    for rows in _batches(activities):
+        yield "".join(json.dumps(row, ensure_ascii=False) + "\n" for row in rows).encode("utf-8")
+
+
+def _require_pyarrow() -> Any:
+    try:
+        import pyarrow
+    except ImportError as exc:
+        raise ExportError("Parquet and Arrow exports need the optional pyarrow package") from exc
+    return pyarrow
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file object whose bytes are drained after every batch."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._chunks: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data: Any) -> int:
+        chunk = bytes(data)
+        self._chunks.append(chunk)
+        self._position += len(chunk)
+        return len(chunk)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def _iter_arrow(activities: List[Dict[str, Any]], fmt: str) -> Iterator[bytes]:
+    pa = _require_pyarrow()
+    schema = pa.schema([(name, getattr(pa, type_name)()) for name, type_name in EXPORT_COLUMNS])
+    sink = _ChunkSink()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+
+        writer = pq.ParquetWriter(sink, schema)
+    else:
+        writer = pa.ipc.new_stream(sink, schema)
+    for rows in _batches(activities):
+        columns = [pa.array([row[name] for row in rows], type=field.type) for name, field in zip(COLUMN_NAMES, schema)]
+        writer.write_batch(pa.RecordBatch.from_arrays(columns, schema=schema))
+        data = sink.drain()
+        if data:
+            yield data
+    writer.close()
+    yield sink.drain()
+
+
+def export_activities(activities: List[Dict[str, Any]], fmt: str) -> Iterator[bytes]:
+    """Byte chunks of ``activities`` in ``fmt``; memory stays bounded by one batch."""
+    if fmt not in EXPORT_FORMATS:
+        raise ExportError(f"Unsupported export format: {fmt}")
+    if fmt in ARROW_FORMATS:
+        _require_pyarrow()
+        return _iter_arrow(activities, fmt)
+    return iter_csv(activities) if fmt == "csv" else iter_ndjson(activities)
@@ -0,0 +1,177 @@
+import math
+from collections import Counter
+from itertools import product
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from route_density import decode_polyline
+
+# Start and end points this close (metres) count as the same place.
+MATCH_RADIUS_M = 250.0
+# Distances may differ by this fraction and still be the same route.
+DISTANCE_TOLERANCE = 0.2
+# Coarse polyline signature: the route resampled to this many evenly spaced
+# points; corresponding points must lie within SIGNATURE_TOLERANCE_M.
+SIGNATURE_POINTS = 9
+SIGNATURE_TOLERANCE_M = 500.0
+
+_M_PER_DEG = 111_320.0
+# Nearest cells first: repeats of a route usually land in its own cell.
+_NEIGHBOUR_OFFSETS = sorted(product((-1, 0, 1), repeat=4), key=lambda o: sum(map(abs, o)))
+_MID_OFFSETS = sorted(product((-1, 0, 1), repeat=2), key=lambda o: sum(map(abs, o)))
+
+Point = Tuple[float, float]
+MidCell = Optional[Tuple[int, int]]
+# (type, start cell x, y, end cell x, y) -> route midpoint cell -> routes
+Grid = Dict[Tuple[str, int, int, int, int], Dict[MidCell, List["_Route"]]]
+
+
+def _to_metres(lat: float, lng: float) -> Point:
+    # Equirectangular around the point itself; accurate well beyond MATCH_RADIUS_M.
+    return lng * _M_PER_DEG * math.cos(math.radians(lat)), lat * _M_PER_DEG
+
+
+def _latlng(value: Any) -> Optional[Tuple[float, float]]:
+    if value and isinstance(value, (list, tuple)) and len(value) >= 2:
+        return float(value[0]), float(value[1])
+    return None
+
+
+class _Route:
+    __slots__ = ("start", "end", "distance", "signature", "members")
+
+    def __init__(self, start: Point, end: Point, distance: float, signature: Optional[np.ndarray]):
+        self.start = start
+        self.end = end
+        self.distance = distance
+        self.signature = signature
+        self.members: List[Dict[str, Any]] = []
+
+
+def _endpoints(activity: Dict[str, Any]) -> Tuple[Optional[Point], Optional[Point], Optional[np.ndarray]]:
+    points = None
+    polyline = activity.get("summary_polyline")
+    if polyline:
+        try:
+            points = decode_polyline(polyline)
+        except ValueError:
+            points = None
+    start = _latlng(activity.get("start_latlng"))
+    end = _latlng(activity.get("end_latlng"))
+    if points is not None and len(points):
+        start = start or (float(points[0, 0]), float(points[0, 1]))
+        end = end or (float(points[-1, 0]), float(points[-1, 1]))
+    if start is None:
+        return None, None, None
+    signature = _signature(points) if points is not None and len(points) else None
+    return _to_metres(*start), _to_metres(*(end or start)), signature
+
+
+def _signature(points: np.ndarray) -> np.ndarray:
+    """Resample a lat/lng path to ``SIGNATURE_POINTS`` points, in metres, evenly spaced along it."""
+    xy = np.stack([points[:, 1] * np.cos(np.radians(points[:, 0])), points[:, 0]], axis=1) * _M_PER_DEG
+    along = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(xy, axis=0).T))))
+    targets = np.linspace(0.0, along[-1], SIGNATURE_POINTS)
+    return np.stack([np.interp(targets, along, xy[:, 0]), np.interp(targets, along, xy[:, 1])], axis=1)
+
+
+def _close(a: Point, b: Point) -> bool:
+    return (a[0] - b[0]) ** 2 + (a[1] - b[1]) ** 2 <= MATCH_RADIUS_M ** 2
+
+
+def _matches(route: _Route, start: Point, end: Point, distance: float, signature: Optional[np.ndarray]) -> bool:
+    if not (_close(route.start, start) and _close(route.end, end)):
+        return False
+    if route.distance and abs(distance - route.distance) > DISTANCE_TOLERANCE * route.distance:
+        return False
+    if route.signature is not None and signature is not None:
+        if np.hypot(*(route.signature - signature).T).max() > SIGNATURE_TOLERANCE_M:
+            return False
+    return True
+
+
+def _mid_cell(signature: Optional[np.ndarray]) -> MidCell:
+    if signature is None:
+        return None
+    x, y = np.floor(signature[SIGNATURE_POINTS // 2] / SIGNATURE_TOLERANCE_M).astype(int).tolist()
+    return x, y
+
+
+def _find_route(
+    grid: Grid,
+    activity_type: str,
+    cell: Tuple[int, ...],
+    start: Point,
+    end: Point,
+    distance: float,
+    signature: Optional[np.ndarray],
+) -> Optional["_Route"]:
+    mid = _mid_cell(signature)
+    sx, sy, ex, ey = cell
+    for dsx, dsy, dex, dey in _NEIGHBOUR_OFFSETS:
+        by_mid = grid.get((activity_type, sx + dsx, sy + dsy, ex + dex, ey + dey))
+        if not by_mid:
+            continue
+        if mid is None:
+            candidates = list(by_mid.values())
+        else:
+            keys = [None] + [(mid[0] + i, mid[1] + j) for i, j in _MID_OFFSETS]
+            candidates = [by_mid[k] for k in keys if k in by_mid]
+        for routes in candidates:
+            for route in routes:
+                if _matches(route, start, end, distance, signature):
+                    return route
+    return None
+
+
+def cluster_routes(activities: List[Dict[str, Any]], use_signature: bool = True) -> List[List[Dict[str, Any]]]:
+    """Group activities that repeat the same route, largest groups first.
+
+    Each route is represented by its first activity. Representatives are hashed
+    into a grid over (start, end) with cells of ``MATCH_RADIUS_M`` and, within a
+    cell, by the midpoint of their polyline signature, so an activity is only
+    compared with routes in neighbouring cells instead of with every other
+    activity; loops from the same front door stay apart by their midpoints.
+    Routes are kept per activity type.
+    """
+    grid: Grid = {}
+    routes: List[_Route] = []
+    for a in sorted(activities, key=lambda a: a.get("start_date") or ""):
+        start, end, signature = _endpoints(a)
+        if start is None:
+            continue
+        if not use_signature:
+            signature = None
+        distance = float(a.get("distance") or 0)
+        activity_type = a.get("type") or ""
+        cell = tuple(int(math.floor(v / MATCH_RADIUS_M)) for v in (*start, *end))
+        match = _find_route(grid, activity_type, cell, start, end, distance, signature)
+        if match is None:
+            match = _Route(start, end, distance, signature)
+            grid.setdefault((activity_type, *cell), {}).setdefault(_mid_cell(signature), []).append(match)
+            routes.append(match)
+        match.members.append(a)
+    groups = [route.members for route in routes]
+    groups.sort(key=lambda members: (len(members), sum(m.get("distance") or 0 for m in members)), reverse=True)
+    return groups
+
+
+def summarize_route(members: List[Dict[str, Any]]) -> Dict[str, Any]:
+    timed = [m for m in members if m.get("moving_time")]
+    best = min(timed, key=lambda m: m["moving_time"]) if timed else None
+    names = Counter(m.get("name") or "Activity" for m in members)
+    latest = max(members, key=lambda m: m.get("start_date") or "")
+    start = _latlng(members[0].get("start_latlng"))
+    return {
+        "name": names.most_common(1)[0][0],
+        "type": members[0].get("type") or "",
+        "count": len(members),
+        "total_distance_m": sum(m.get("distance") or 0 for m in members),
+        "best_time_s": best["moving_time"] if best else None,
+        "best_activity_id": best.get("id") if best else None,
+        "last_date": (latest.get("start_date_local") or latest.get("start_date") or "")[:10],
+        "start": start,
+        "summary_polyline": latest.get("summary_polyline"),
+        "activity_ids": [m.get("id") for m in members],
+    }
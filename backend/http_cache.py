@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+# Check the size bound every this many writes rather than on each one.
+EVICT_EVERY = 50
+# Expired entries stay this long so they can still be revalidated by ETag.
+STALE_GRACE_S = 7 * 24 * 3600
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS blobs (
+    hash TEXT PRIMARY KEY,
+    body BLOB NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS entries (
+    key TEXT PRIMARY KEY,
+    url TEXT NOT NULL,
+    status INTEGER NOT NULL,
+    etag TEXT,
+    headers TEXT NOT NULL,
+    body_hash TEXT NOT NULL REFERENCES blobs(hash),
+    stored_at REAL NOT NULL,
+    expires_at REAL,
+    last_used REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS entries_last_used ON entries(last_used);
+"""
+
+
+class CachedResponse:
+    """The parts of ``requests.Response`` that ``strava_client`` reads."""
+
+    def __init__(self, status_code: int, content: bytes, headers: Dict[str, str]) -> None:
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers
+        self.from_cache = True
+
+    @property
+    def text(self) -> str:
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self) -> Any:
+        return json.loads(self.content)
+
+
+class CacheEntry:
+    def __init__(self, row: Tuple[Any, ...]) -> None:
+        self.status, self.etag, headers, body, self.expires_at = row
+        self.headers: Dict[str, str] = json.loads(headers)
+        self.body: bytes = zlib.decompress(body)
+
+    @property
+    def fresh(self) -> bool:
+        return self.expires_at is None or self.expires_at > time.time()
+
+    def response(self) -> CachedResponse:
+        return CachedResponse(self.status, self.body, self.headers)
+
+
+def cache_key(method: str, url: str, params: Optional[Dict[str, Any]], scope: str) -> str:
+    canonical = json.dumps([method.upper(), url, sorted((params or {}).items()), scope], default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class HttpCache:
+    """Size-bounded, content-addressed HTTP response cache in one SQLite file.
+
+    Entries map a request key to a response whose compressed body is stored
+    once per distinct content hash. When the stored bodies exceed ``max_bytes``
+    the least recently used entries are evicted. ``max_bytes=None`` keeps
+    everything, which is what record/replay cassettes want.
+    """
+
+    def __init__(self, path: str, max_bytes: Optional[int] = None) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self._local = threading.local()
+        self._writes = 0
+        self._writes_lock = threading.Lock()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        # A forked process must not reuse its parent's connection.
+        if conn is not None and getattr(self._local, "pid", None) != os.getpid():
+            conn = None
+        if conn is None:
+            Path(self.path).parent.mkdir(mode=0o700, parents=True, exist_ok=True)
+            # Responses include athlete data, so the file is private like the athlete
+            # store; SQLite gives the -wal/-shm files the same mode.
+            fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                os.fchmod(fd, 0o600)
+            finally:
+                os.close(fd)
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        conn = self._conn()
+        row = conn.execute(
+            "SELECT e.status, e.etag, e.headers, b.body, e.expires_at"
+            " FROM entries e JOIN blobs b ON b.hash = e.body_hash WHERE e.key = ?",
+            (key,),
+        ).fetchone()
+        if row is None:
+            return None
+        conn.execute("UPDATE entries SET last_used = ? WHERE key = ?", (time.time(), key))
+        return CacheEntry(row)
+
+    def put(
+        self,
+        key: str,
+        url: str,
+        status: int,
+        content: bytes,
+        headers: Dict[str, str],
+        ttl: Optional[float],
+    ) -> None:
+        now = time.time()
+        body_hash = hashlib.sha256(content).hexdigest()
+        compressed = zlib.compress(content)
+        etag = headers.get("ETag") or headers.get("etag")
+        kept_headers = {k: v for k, v in headers.items() if k.lower() in ("content-type", "etag")}
+        conn = self._conn()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute(
+                "INSERT OR IGNORE INTO blobs (hash, body, size) VALUES (?, ?, ?)",
+                (body_hash, compressed, len(compressed)),
+            )
+            conn.execute(
+                "INSERT OR REPLACE INTO entries"
+                " (key, url, status, etag, headers, body_hash, stored_at, expires_at, last_used)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, url, status, etag, json.dumps(kept_headers), body_hash, now,
+                 now + ttl if ttl is not None else None, now),
+            )
+        with self._writes_lock:
+            self._writes += 1
+            due = self._writes % EVICT_EVERY == 0
+        if due:
+            self.evict()
+
+    def refresh(self, key: str, ttl: Optional[float]) -> None:
+        """Extend an entry after the server confirmed it unchanged (HTTP 304)."""
+        now = time.time()
+        self._conn().execute(
+            "UPDATE entries SET expires_at = ?, last_used = ? WHERE key = ?",
+            (now + ttl if ttl is not None else None, now, key),
+        )
+
+    def size(self) -> int:
+        return self._conn().execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+
+    def evict(self) -> int:
+        """Drop least recently used entries until stored bodies fit ``max_bytes``."""
+        if self.max_bytes is None:
+            return 0
+        conn = self._conn()
+        removed = 0
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM entries WHERE expires_at IS NOT NULL AND expires_at < ?", (time.time() - STALE_GRACE_S,))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            while total > self.max_bytes:
+                victims = conn.execute("SELECT key FROM entries ORDER BY last_used LIMIT 100").fetchall()
+                if not victims:
+                    break
+                conn.executemany("DELETE FROM entries WHERE key = ?", victims)
+                removed += len(victims)
+                conn.execute("DELETE FROM blobs WHERE hash NOT IN (SELECT body_hash FROM entries)")
+                total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM blobs").fetchone()[0]
+            conn.execute("DELETE FROM blobs WHERE hash NOT IN (SELECT body_hash FROM entries)")
+        return removed
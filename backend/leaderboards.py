@@ -0,0 +1,264 @@
+import heapq
+import re
+import threading
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from athlete_store import load_activities, load_groups, pending_activities, save_groups
+from day_index import DayIndex, build_day_index
+
+GROUP_ID_RE = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+# metric -> unit
+LEADERBOARD_METRICS: Dict[str, str] = {
+    "distance": "km",
+    "elevation": "m",
+    "moving_time": "h",
+    "activities": "activities",
+    "active_days": "days",
+    "longest_streak": "days",
+}
+
+# metric -> (row in DayIndex.prefix, unit scale)
+_PREFIX_ROWS: Dict[str, Tuple[int, float]] = {
+    "distance": (0, 1 / 1000),
+    "moving_time": (1, 1 / 3600),
+    "elevation": (2, 1.0),
+    "activities": (3, 1.0),
+    "active_days": (4, 1.0),
+}
+
+
+class GroupError(Exception):
+    pass
+
+
+class GroupNotFound(GroupError):
+    pass
+
+
+class GroupForbidden(GroupError):
+    pass
+
+
+@dataclass
+class Leaderboard:
+    members_count: int
+    # (rank, member, value), ranks shared on ties
+    entries: List[Tuple[int, "AthleteAggregate", float]]
+    me: Tuple[int, float]
+    group_total: Optional[float]
+
+
+class StreakTable:
+    """Longest run of active days inside any date range in O(1).
+
+    ``ending[i]`` is the length of the active run ending on day ``i`` and
+    ``starting[i]`` the length of the run starting there. In ``lo..hi`` the
+    run crossing ``lo`` contributes ``starting[lo]`` (clipped); every later
+    run is whole, so its length is a range maximum of ``ending``, answered
+    from a sparse table.
+    """
+
+    def __init__(self, active: np.ndarray) -> None:
+        n = active.size
+        positions = np.arange(n)
+        last_gap = np.maximum.accumulate(np.where(active, -1, positions))
+        self.ending = (positions - last_gap).astype(np.int32)
+        reversed_active = active[::-1]
+        next_gap = np.maximum.accumulate(np.where(reversed_active, -1, positions))
+        self.starting = (positions - next_gap).astype(np.int32)[::-1]
+        self.table = [self.ending]
+        width = 1
+        while width * 2 <= n:
+            prev = self.table[-1]
+            self.table.append(np.maximum(prev[:-width], prev[width:]))
+            width *= 2
+
+    def _range_max(self, lo: int, hi: int) -> int:
+        level = (hi - lo + 1).bit_length() - 1
+        row = self.table[level]
+        return int(max(row[lo], row[hi - (1 << level) + 1]))
+
+    def longest(self, lo: int, hi: int) -> int:
+        if hi < lo:
+            return 0
+        first = min(int(self.starting[lo]), hi - lo + 1)
+        after = lo + int(self.starting[lo])
+        return max(first, self._range_max(after, hi) if after <= hi else 0)
+
+
+class AthleteAggregate:
+    """Per-athlete partial aggregates answered from the athlete's day index."""
+
+    def __init__(self, athlete_id: int, name: str, day_index: DayIndex) -> None:
+        self.athlete_id = athlete_id
+        self.name = name
+        self.day_index = day_index
+        self._streaks: Dict[str, StreakTable] = {}
+
+    def _streak_table(self, activity_type: str) -> StreakTable:
+        table = self._streaks.get(activity_type)
+        if table is None:
+            table = self._streaks[activity_type] = StreakTable(self.day_index.get(activity_type).count > 0)
+        return table
+
+    def value(self, metric: str, start: date, end: date, activity_type: str = "All") -> float:
+        index = self.day_index
+        if metric == "longest_streak":
+            lo = max(index.offset(start), 0)
+            hi = min(index.offset(end), index.days - 1)
+            return float(self._streak_table(activity_type).longest(lo, hi))
+        row, scale = _PREFIX_ROWS[metric]
+        lo = min(max(index.offset(start), 0), index.days)
+        hi = min(max(index.offset(end) + 1, 0), index.days)
+        if hi <= lo:
+            return 0.0
+        prefix = index.prefix(activity_type)
+        return round(float(prefix[row, hi] - prefix[row, lo]) * scale, 2)
+
+
+class GroupRegistry:
+    """Opt-in groups of athletes and the aggregates their leaderboards read.
+
+    Membership is persisted in the athlete store; aggregates live in memory
+    and are refreshed whenever a member's activities change, or rebuilt from
+    the athlete store after a restart. Rebuilds happen outside the registry
+    lock, under a per-athlete lock, so they never block other groups.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._groups: Optional[Dict[str, Dict[int, str]]] = None
+        self._aggregates: Dict[int, AthleteAggregate] = {}
+        self._build_locks: Dict[int, threading.Lock] = {}
+
+    def _members(self) -> Dict[str, Dict[int, str]]:
+        if self._groups is None:
+            stored = load_groups()
+            self._groups = {gid: {int(a): n for a, n in members.items()} for gid, members in stored.items()}
+        return self._groups
+
+    def _save(self) -> None:
+        save_groups({gid: {str(a): n for a, n in members.items()} for gid, members in self._members().items()})
+
+    def join(self, group_id: str, athlete_id: int, name: str, day_index: DayIndex) -> int:
+        if not GROUP_ID_RE.match(group_id):
+            raise GroupError("Group ids may only contain letters, digits, '-' and '_'")
+        with self._lock:
+            members = self._members().setdefault(group_id, {})
+            members[athlete_id] = name
+            self._aggregates[athlete_id] = AthleteAggregate(athlete_id, name, day_index)
+            self._save()
+            return len(members)
+
+    def leave(self, group_id: str, athlete_id: int) -> int:
+        with self._lock:
+            members = self._members().get(group_id)
+            if not members or athlete_id not in members:
+                raise GroupError("Not a member of this group")
+            del members[athlete_id]
+            if not members:
+                del self._members()[group_id]
+            if not any(athlete_id in m for m in self._members().values()):
+                self._aggregates.pop(athlete_id, None)
+            self._save()
+            return len(members)
+
+    def groups_for(self, athlete_id: int) -> List[str]:
+        with self._lock:
+            return sorted(gid for gid, members in self._members().items() if athlete_id in members)
+
+    def update_athlete(self, athlete_id: Optional[int], day_index: DayIndex) -> None:
+        """Swap in a member's new day index after their activities changed."""
+        if athlete_id is None:
+            return
+        with self._lock:
+            if not any(athlete_id in m for m in self._members().values()):
+                return
+            previous = self._aggregates.get(athlete_id)
+            name = previous.name if previous else self._lookup_name(athlete_id)
+            self._aggregates[athlete_id] = AthleteAggregate(athlete_id, name, day_index)
+
+    def name_of(self, athlete_id: int) -> str:
+        with self._lock:
+            return self._lookup_name(athlete_id)
+
+    def _lookup_name(self, athlete_id: int) -> str:
+        for members in self._members().values():
+            if athlete_id in members:
+                return members[athlete_id]
+        return f"Athlete {athlete_id}"
+
+    def _aggregate(self, athlete_id: int, name: str) -> AthleteAggregate:
+        """The member's aggregate, loading it from the athlete store if needed; call without ``_lock``."""
+        aggregate = self._aggregates.get(athlete_id)
+        if aggregate is not None:
+            return aggregate
+        with self._lock:
+            build_lock = self._build_locks.setdefault(athlete_id, threading.Lock())
+        with build_lock:
+            aggregate = self._aggregates.get(athlete_id)
+            if aggregate is not None:
+                return aggregate
+            activities = pending_activities(athlete_id)
+            if activities is None:
+                activities = load_activities(athlete_id)
+            built = AthleteAggregate(athlete_id, name, build_day_index(list(activities)))
+            with self._lock:
+                # update_athlete may have installed a fresher aggregate during the build.
+                return self._aggregates.setdefault(athlete_id, built)
+
+    def warm(self) -> int:
+        """Build every member's aggregate ahead of the first leaderboard request.
+
+        Meant to run in a background thread at startup; returns the number of
+        members loaded.
+        """
+        with self._lock:
+            members = {a: n for group in self._members().values() for a, n in group.items()}
+        for athlete_id, name in members.items():
+            self._aggregate(athlete_id, name)
+        return len(members)
+
+    def leaderboard(
+        self,
+        group_id: str,
+        athlete_id: int,
+        metric: str,
+        start: date,
+        end: date,
+        activity_type: str = "All",
+        limit: int = 10,
+    ) -> Leaderboard:
+        """Top ``limit`` members by ``metric`` over ``start``..``end``, plus the caller's rank.
+
+        Only members may read a group's leaderboard. Each member's value is an
+        O(1) lookup in their own aggregates, and the top ``limit`` are picked
+        with a heap, so no activities are rescanned.
+        """
+        if metric not in LEADERBOARD_METRICS:
+            raise GroupError(f"Unknown metric: {metric}")
+        with self._lock:
+            members = dict(self._members().get(group_id) or {})
+        if not members:
+            raise GroupNotFound("Group not found")
+        if athlete_id not in members:
+            raise GroupForbidden("Not a member of this group")
+        aggregates = [self._aggregate(a, n) for a, n in members.items()]
+        scored = [(agg.value(metric, start, end, activity_type), agg) for agg in aggregates]
+        top = heapq.nlargest(limit, scored, key=lambda item: (item[0], -item[1].athlete_id))
+        entries: List[Tuple[int, AthleteAggregate, float]] = []
+        for position, (value, agg) in enumerate(top, start=1):
+            rank = entries[-1][0] if entries and entries[-1][2] == value else position
+            entries.append((rank, agg, value))
+        own = next(value for value, agg in scored if agg.athlete_id == athlete_id)
+        me = (1 + sum(1 for value, _ in scored if value > own), own)
+        # Streaks do not add up across athletes.
+        group_total = sum(value for value, _ in scored) if metric != "longest_streak" else None
+        return Leaderboard(len(members), entries, me, group_total)
+
+
+GROUPS = GroupRegistry()
@@ -1,19 +1,49 @@
 from __future__ import annotations
 
+import threading
 import uuid
+import zipfile
 from datetime import datetime
 from typing import Any, Dict, List, Optional
 
-from fastapi import Cookie, FastAPI, HTTPException, Request, Response
+from fastapi import BackgroundTasks, Cookie, FastAPI, File, HTTPException, Query, Request, Response, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, RedirectResponse
-
-from cache import CACHE, init_session, update_last_fetched
+from fastapi.responses import JSONResponse, RedirectResponse, StreamingResponse
+
+from athlete_store import (
+    activities_fingerprint,
+    flush_pending,
+    load_best_efforts,
+    load_wrapped_snapshot,
+    save_athlete,
+    save_best_efforts,
+    save_tokens,
+    store_enabled,
+)
+from bulk_import import ArchiveError, import_strava_archive
+from cache import CACHE, init_session, set_activities
+from day_index import DayIndex, build_day_index
+from export import EXPORT_FORMATS, ExportError, export_activities
+from leaderboards import GROUPS, LEADERBOARD_METRICS, GroupError, GroupForbidden, GroupNotFound
+from offload import run_compute, shutdown_pool
+from route_density import BASE_ZOOM, MAX_ZOOM, RouteDensity
+from search_index import SearchIndex
+from sketches import DistributionStore
 from schemas import (
     ActivityHighlight,
+    BestEffortsResponse,
+    CalendarResponse,
+    DistributionsResponse,
     FactsResponse,
+    FavouriteRoutesResponse,
+    GroupMembershipResponse,
     HighlightsResponse,
+    LeaderboardEntry,
+    LeaderboardResponse,
+    RangeStatsResponse,
+    RouteDensityInfo,
     SummaryResponse,
+    TrainingLoadResponse,
     TrendsResponse,
     WrappedResponse,
 )
@@ -23,15 +53,27 @@ from strava_client import (
     ensure_fresh_token,
     exchange_code_for_token,
     fetch_activities,
+    fetch_streams_for_activities,
+    rate_limit_remaining,
 )
 from utils import (
+    RIDE_TYPES,
+    RUN_TYPES,
     build_activity_highlight,
+    build_calendar,
+    build_range_stats,
+    calendar_arrays,
+    compute_activity_best_efforts,
+    compute_best_efforts,
+    compute_distributions,
     compute_facts,
-    compute_highlights,
-    compute_summary,
-    compute_trends,
-    compute_wrapped,
+    compute_favourite_routes,
+    compute_kudos_givers,
+    compute_training_load,
+    simplify_activity,
+    wrapped_activities,
 )
+from webhooks import WEBHOOK_VERIFY_TOKEN, is_subscribed_event, process_event
 
 
 app = FastAPI(title="Strava Year in Review")
@@ -45,6 +87,11 @@ app.add_middleware(
 )
 
 SESSION_COOKIE_NAME = "codex_session"
+# Stream fetches per request; Strava allows 100 calls per 15 minutes for the whole app.
+BEST_EFFORTS_BATCH_SIZE = 20
+# Calls left in the window for syncs, kudos and webhooks before streams are fetched.
+BEST_EFFORTS_RATE_RESERVE = 40
+BEST_EFFORT_TYPES = RUN_TYPES | RIDE_TYPES
 
 
 @app.get("/api/session")
@@ -72,6 +119,9 @@ def _get_session_tokens(request: Request) -> Dict[str, Any]:
         raise HTTPException(status_code=401, detail="Not connected to Strava")
     fresh_tokens = ensure_fresh_token(tokens)
     CACHE[session_id]["tokens"] = fresh_tokens
+    athlete_id = CACHE[session_id].get("athlete_id")
+    if fresh_tokens is not tokens and athlete_id:
+        save_tokens(athlete_id, fresh_tokens)
     return fresh_tokens
 
 
@@ -85,19 +135,24 @@ def auth_url():
 
 
 @app.get("/auth/strava/callback")
-def auth_callback(request: Request, code: str):
+def auth_callback(request: Request, code: str, background_tasks: BackgroundTasks):
     session_id = get_session_id(request)
     try:
         token_resp = exchange_code_for_token(code)
     except StravaError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
+    athlete = token_resp.get("athlete") or {}
+    athlete_id = athlete.get("id")
     tokens = {
         "access_token": token_resp.get("access_token"),
         "refresh_token": token_resp.get("refresh_token"),
         "expires_at": token_resp.get("expires_at"),
+        "athlete_id": athlete_id,
     }
     CACHE[session_id]["tokens"] = tokens
+    CACHE[session_id]["athlete_id"] = athlete_id
+    CACHE[session_id]["athlete_name"] = f"{athlete.get('firstname', '')} {athlete.get('lastname', '')}".strip() or None
 
     start_of_year = datetime.utcnow().replace(month=1, day=1, hour=0, minute=0, second=0, microsecond=0)
     after_ts = int(start_of_year.timestamp())
@@ -106,81 +161,275 @@ def auth_callback(request: Request, code: str):
     except StravaError as exc:
         raise HTTPException(status_code=400, detail=str(exc)) from exc
 
-    simplified = [
-        {
-            "id": a.get("id"),
-            "name": a.get("name"),
-            "type": a.get("type"),
-            "start_date_local": a.get("start_date_local") or a.get("start_date"),
-            "start_date": a.get("start_date"),
-            "distance": a.get("distance"),
-            "moving_time": a.get("moving_time"),
-            "total_elevation_gain": a.get("total_elevation_gain"),
-            "average_speed": a.get("average_speed"),
-            "kudos_count": a.get("kudos_count"),
-            "start_latlng": a.get("start_latlng"),
-            "athlete_count": a.get("athlete_count"),
-        }
-        for a in activities
-    ]
+    simplified = [simplify_activity(a) for a in activities]
 
-    CACHE[session_id]["activities"] = simplified
-    update_last_fetched(session_id)
+    set_activities(session_id, simplified)
+    GROUPS.update_athlete(athlete_id, _get_day_index(session_id))
+    _get_search_index(session_id)
+    background_tasks.add_task(update_route_density, session_id)
+    background_tasks.add_task(persist_athlete, session_id)
 
     frontend_url = "http://localhost:5173/"
     return RedirectResponse(url=frontend_url)
 
 
+@app.post("/api/import")
+def import_archive(request: Request, background_tasks: BackgroundTasks, archive: UploadFile = File(...)):
+    session_id = get_session_id(request)
+    stats: Dict[str, int] = {}
+    try:
+        imported = import_strava_archive(archive.file, stats=stats)
+    except (ArchiveError, zipfile.BadZipFile) as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid Strava export: {exc}") from exc
+
+    merged = {a["id"]: a for a in imported}
+    for a in CACHE[session_id].get("activities") or []:
+        merged[a.get("id")] = a
+    set_activities(session_id, sorted(merged.values(), key=lambda a: a.get("start_date") or ""))
+    CACHE[session_id]["imported"] = True
+    GROUPS.update_athlete(CACHE[session_id].get("athlete_id"), _get_day_index(session_id))
+    _get_search_index(session_id)
+    background_tasks.add_task(update_route_density, session_id)
+    background_tasks.add_task(persist_athlete, session_id)
+    return {
+        "imported": len(imported),
+        "activities_count": len(merged),
+        "skipped_files": stats.get("skipped_files", 0),
+    }
+
+
 def _get_activities_for_session(request: Request) -> List[Dict[str, Any]]:
     session_id = get_session_id(request)
-    _get_session_tokens(request)
+    # Sessions loaded from a bulk export can be used without a Strava connection.
+    if CACHE[session_id].get("tokens") or not CACHE[session_id].get("imported"):
+        _get_session_tokens(request)
     activities = CACHE[session_id].get("activities", [])
     if activities is None:
         activities = []
     return activities
 
 
+def _get_day_index(session_id: str) -> DayIndex:
+    day_index = CACHE[session_id].get("day_index")
+    if day_index is None:
+        day_index = build_day_index(CACHE[session_id].get("activities") or [])
+        CACHE[session_id]["day_index"] = day_index
+    return day_index
+
+
+def _get_search_index(session_id: str) -> SearchIndex:
+    index = CACHE[session_id].get("search_index")
+    if index is None:
+        index = SearchIndex.build(CACHE[session_id].get("activities") or [])
+        CACHE[session_id]["search_index"] = index
+    return index
+
+
+def _get_fingerprint(session_id: str) -> str:
+    fingerprint = CACHE[session_id].get("fingerprint")
+    if fingerprint is None:
+        fingerprint = activities_fingerprint(CACHE[session_id].get("activities") or [])
+        CACHE[session_id]["fingerprint"] = fingerprint
+    return fingerprint
+
+
+def persist_athlete(session_id: str) -> None:
+    """Store the session's activities and tokens for batch jobs such as ``wrapped_batch``."""
+    session = CACHE.get(session_id)
+    if not session or not session.get("athlete_id"):
+        return
+    save_athlete(session["athlete_id"], session.get("tokens"), session.get("activities") or [])
+
+
+def _parse_date_param(value: Optional[str]):
+    if not value:
+        return None
+    try:
+        return datetime.fromisoformat(value).date()
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Invalid date format") from exc
+
+
+def _parse_date_range(start: Optional[str], end: Optional[str]):
+    """Both bounds of a required inclusive date range; 400 if either is missing or they are reversed."""
+    start_date, end_date = _parse_date_param(start), _parse_date_param(end)
+    if start_date is None or end_date is None:
+        raise HTTPException(status_code=400, detail="start and end dates are required")
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    return start_date, end_date
+
+
 @app.get("/api/summary", response_model=SummaryResponse)
 def summary(request: Request, activity_type: str = "All"):
-    activities = _get_activities_for_session(request)
-    result = compute_summary(activities, activity_type=activity_type)
-    CACHE[get_session_id(request)]["summary"] = result.dict()
+    _get_activities_for_session(request)
+    session_id = get_session_id(request)
+    result = run_compute(CACHE[session_id], "summary", activity_type=activity_type)
+    CACHE[session_id]["summary"] = result.dict()
     return result
 
 
 @app.get("/api/trends", response_model=TrendsResponse)
 def trends(request: Request, activity_type: str = "All"):
-    activities = _get_activities_for_session(request)
-    result = compute_trends(activities, activity_type=activity_type)
-    CACHE[get_session_id(request)]["trends"] = result.dict()
+    _get_activities_for_session(request)
+    session_id = get_session_id(request)
+    result = run_compute(CACHE[session_id], "trends", activity_type=activity_type)
+    CACHE[session_id]["trends"] = result.dict()
     return result
 
 
 @app.get("/api/highlights", response_model=HighlightsResponse)
 def highlights(request: Request, activity_type: str = "All"):
-    activities = _get_activities_for_session(request)
-    result = compute_highlights(activities, activity_type=activity_type)
-    CACHE[get_session_id(request)]["highlights"] = result.dict()
+    _get_activities_for_session(request)
+    session_id = get_session_id(request)
+    result = run_compute(CACHE[session_id], "highlights", activity_type=activity_type)
+    CACHE[session_id]["highlights"] = result.dict()
     return result
 
 
 @app.get("/api/facts", response_model=FactsResponse)
 def facts(request: Request, activity_type: str = "All"):
-    activities = _get_activities_for_session(request)
-    summary_res = compute_summary(activities, activity_type=activity_type)
+    _get_activities_for_session(request)
+    session_id = get_session_id(request)
+    summary_res = run_compute(CACHE[session_id], "summary", activity_type=activity_type)
     result = compute_facts(summary_res)
-    CACHE[get_session_id(request)]["facts"] = result.dict()
+    CACHE[session_id]["facts"] = result.dict()
     return result
 
 
+def _add_kudos_givers(
+    session_id: str, wrapped: Dict[str, Any], activity_type: str, year: int, tokens: Dict[str, Any]
+) -> Dict[str, Any]:
+    # Kudos need Strava calls, which stay in this process so its HTTP cache and
+    # rate-limit readings see them; the rest of Wrapped may come from a worker or snapshot.
+    activities = wrapped_activities(CACHE[session_id].get("activities") or [], activity_type, year)
+    givers = compute_kudos_givers(activities, tokens)
+    return {**wrapped, "top_kudos_givers": givers, "favourite_partners": givers[:]}
+
+
 @app.get("/api/wrapped", response_model=WrappedResponse)
 def wrapped(request: Request, activity_type: str = "All"):
     session_id = get_session_id(request)
     tokens = _get_session_tokens(request)
-    activities = CACHE[session_id].get("activities", []) or []
-    result = compute_wrapped(activities, activity_type=activity_type, tokens=tokens)
-    CACHE[session_id]["wrapped"] = result.dict()
-    return result
+    athlete_id = CACHE[session_id].get("athlete_id")
+    year = datetime.utcnow().year
+    if athlete_id:
+        # Precomputed by wrapped_batch; only used while the activities still match.
+        snapshot = load_wrapped_snapshot(athlete_id, year, activity_type, _get_fingerprint(session_id))
+        if snapshot is not None:
+            result = snapshot["wrapped"]
+            if not snapshot.get("kudos"):
+                result = _add_kudos_givers(session_id, result, activity_type, year, tokens)
+            CACHE[session_id]["wrapped"] = result
+            return WrappedResponse(**result)
+    computed = run_compute(CACHE[session_id], "wrapped", activity_type=activity_type, year=year)
+    result = _add_kudos_givers(session_id, computed.dict(), activity_type, year, tokens)
+    CACHE[session_id]["wrapped"] = result
+    return WrappedResponse(**result)
+
+
+@app.get("/api/training-load", response_model=TrainingLoadResponse)
+def training_load(request: Request, activity_type: str = "All", start: Optional[str] = None, end: Optional[str] = None):
+    _get_activities_for_session(request)
+    day_index = _get_day_index(get_session_id(request))
+    return compute_training_load(
+        day_index,
+        activity_type=activity_type,
+        start=_parse_date_param(start),
+        end=_parse_date_param(end),
+    )
+
+
+@app.get("/api/range-stats", response_model=RangeStatsResponse)
+def range_stats(request: Request, start: str, end: str, activity_type: str = "All"):
+    _get_activities_for_session(request)
+    start_date, end_date = _parse_date_range(start, end)
+    day_index = _get_day_index(get_session_id(request))
+    totals = day_index.range_totals(start_date, end_date, activity_type=activity_type)
+    return build_range_stats(totals, start_date, end_date, activity_type=activity_type)
+
+
+@app.get("/api/distributions", response_model=DistributionsResponse)
+def distributions(
+    request: Request,
+    activity_type: str = "All",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    bins: int = Query(default=20, ge=1, le=100),
+):
+    activities = _get_activities_for_session(request)
+    session_id = get_session_id(request)
+    store = CACHE[session_id].get("distributions")
+    if store is None:
+        store = CACHE[session_id]["distributions"] = DistributionStore.build(activities)
+    return compute_distributions(
+        store,
+        activities,
+        activity_type=activity_type,
+        start=_parse_date_param(start),
+        end=_parse_date_param(end),
+        bins=bins,
+    )
+
+
+@app.get("/api/search", response_model=List[ActivityHighlight])
+def search_activities(
+    request: Request,
+    q: str = "",
+    activity_type: str = "All",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    min_distance_km: Optional[float] = None,
+    max_distance_km: Optional[float] = None,
+    limit: int = Query(default=50, ge=1, le=500),
+):
+    _get_activities_for_session(request)
+    index = _get_search_index(get_session_id(request))
+    matches = index.search(
+        q,
+        activity_type=activity_type,
+        start=_parse_date_param(start),
+        end=_parse_date_param(end),
+        min_distance_km=min_distance_km,
+        max_distance_km=max_distance_km,
+        limit=limit,
+    )
+    return [build_activity_highlight(a) for a in matches]
+
+
+@app.get("/api/calendar", response_model=CalendarResponse)
+def calendar(
+    request: Request,
+    activity_type: str = "All",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    format: str = "json",
+):
+    """Dense per-day series as typed arrays; ``format=binary`` returns the raw bytes.
+
+    The binary body is ``days`` float32 distances (km), ``days`` float32 moving
+    minutes and ``days`` uint8 counts, little-endian, with the first day and
+    length in the ``X-Calendar-Start`` / ``X-Calendar-Days`` headers.
+    """
+    _get_activities_for_session(request)
+    day_index = _get_day_index(get_session_id(request))
+    start_date, end_date = _parse_date_param(start), _parse_date_param(end)
+    if format == "binary":
+        first, distance, minutes, counts = calendar_arrays(day_index, activity_type, start_date, end_date)
+        headers = {"X-Calendar-Start": first.isoformat(), "X-Calendar-Days": str(counts.size)}
+        body = distance.tobytes() + minutes.tobytes() + counts.tobytes()
+        return Response(content=body, media_type="application/octet-stream", headers=headers)
+    if format != "json":
+        raise HTTPException(status_code=400, detail="Unsupported calendar format")
+    return build_calendar(day_index, activity_type, start_date, end_date)
+
+
+@app.get("/api/calendar/ids", response_model=Dict[str, List[int]])
+def calendar_ids(request: Request, start: str, end: str, activity_type: str = "All"):
+    _get_activities_for_session(request)
+    start_date, end_date = _parse_date_range(start, end)
+    day_index = _get_day_index(get_session_id(request))
+    return {day.isoformat(): ids for day, ids in day_index.ids_between(start_date, end_date, activity_type).items()}
 
 
 @app.get("/api/day/{date}", response_model=List[ActivityHighlight])
@@ -221,6 +470,260 @@ def activities_for_period(request: Request, start: str, end: str, activity_type:
     return [build_activity_highlight(a) for a in period_activities]
 
 
+@app.get("/api/best-efforts", response_model=BestEffortsResponse)
+def best_efforts(request: Request, activity_type: str = "All"):
+    session_id = get_session_id(request)
+    tokens = _get_session_tokens(request)
+    session = CACHE[session_id]
+    activities = session.get("activities", []) or []
+    athlete_id = session.get("athlete_id")
+    efforts = session.get("best_efforts")
+    if efforts is None:
+        efforts = session["best_efforts"] = load_best_efforts(athlete_id) if athlete_id else {}
+
+    candidates = [
+        a
+        for a in activities
+        if a.get("id") is not None
+        and a.get("id") not in efforts
+        and a.get("type") in BEST_EFFORT_TYPES
+        and (activity_type == "All" or a.get("type") == activity_type)
+    ]
+    candidates.sort(key=lambda a: a.get("start_date") or "", reverse=True)
+    batch_size = BEST_EFFORTS_BATCH_SIZE
+    remaining = rate_limit_remaining()
+    if remaining is not None:
+        batch_size = min(batch_size, max(remaining - BEST_EFFORTS_RATE_RESERVE, 0))
+    batch = [a.get("id") for a in candidates[:batch_size]]
+    streams = fetch_streams_for_activities(tokens.get("access_token"), batch, athlete_id=athlete_id)
+    computed = {activity_id: compute_activity_best_efforts(s) for activity_id, s in streams.items()}
+    efforts.update(computed)
+    if athlete_id:
+        save_best_efforts(athlete_id, computed)
+
+    pending = len(candidates) - len(streams)
+    return compute_best_efforts(activities, efforts, activity_type=activity_type, pending_activities=pending)
+
+
+def update_route_density(session_id: str) -> None:
+    session = CACHE.get(session_id)
+    if session is None:
+        return
+    density = session.get("route_density")
+    if density is None:
+        density = session["route_density"] = RouteDensity()
+    density.add_activities(session.get("activities") or [])
+
+
+@app.get("/api/export")
+def export(
+    request: Request,
+    format: str = "csv",
+    activity_type: str = "All",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+):
+    activities = _get_activities_for_session(request)
+    first = _parse_date_param(start)
+    last = _parse_date_param(end)
+    if activity_type != "All" or first or last:
+        first_str = first.isoformat() if first else None
+        last_str = last.isoformat() if last else None
+        activities = [
+            a
+            for a in activities
+            if (activity_type == "All" or a.get("type") == activity_type)
+            and (not first_str or (a.get("start_date_local") or a.get("start_date") or "")[:10] >= first_str)
+            and (not last_str or (a.get("start_date_local") or a.get("start_date") or "")[:10] <= last_str)
+        ]
+    else:
+        # Webhook patches edit the session list in place; stream a stable copy.
+        activities = list(activities)
+    try:
+        chunks = export_activities(activities, format)
+    except ExportError as exc:
+        status = 400 if format not in EXPORT_FORMATS else 501
+        raise HTTPException(status_code=status, detail=str(exc)) from exc
+    media_type, extension = EXPORT_FORMATS[format]
+    headers = {"Content-Disposition": f'attachment; filename="activities.{extension}"'}
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+
+def _group_athlete(request: Request) -> int:
+    session_id = get_session_id(request)
+    _get_session_tokens(request)
+    athlete_id = CACHE[session_id].get("athlete_id")
+    if not athlete_id:
+        raise HTTPException(status_code=400, detail="Groups need a Strava-connected athlete")
+    return athlete_id
+
+
+@app.post("/api/groups/{group_id}/join", response_model=GroupMembershipResponse)
+def join_group(request: Request, group_id: str):
+    athlete_id = _group_athlete(request)
+    session_id = get_session_id(request)
+    name = CACHE[session_id].get("athlete_name") or f"Athlete {athlete_id}"
+    try:
+        count = GROUPS.join(group_id, athlete_id, name, _get_day_index(session_id))
+    except GroupError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    return GroupMembershipResponse(
+        group_id=group_id, joined=True, members_count=count, groups=GROUPS.groups_for(athlete_id)
+    )
+
+
+@app.post("/api/groups/{group_id}/leave", response_model=GroupMembershipResponse)
+def leave_group(request: Request, group_id: str):
+    athlete_id = _group_athlete(request)
+    try:
+        count = GROUPS.leave(group_id, athlete_id)
+    except GroupError as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    return GroupMembershipResponse(
+        group_id=group_id, joined=False, members_count=count, groups=GROUPS.groups_for(athlete_id)
+    )
+
+
+@app.get("/api/groups/{group_id}/leaderboard", response_model=LeaderboardResponse)
+def group_leaderboard(
+    request: Request,
+    group_id: str,
+    metric: str = "distance",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    activity_type: str = "All",
+    limit: int = Query(default=10, ge=1, le=500),
+):
+    athlete_id = _group_athlete(request)
+    today = datetime.utcnow().date()
+    start_date = _parse_date_param(start) or today.replace(month=1, day=1)
+    end_date = _parse_date_param(end) or today
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end must not be before start")
+    try:
+        board = GROUPS.leaderboard(
+            group_id, athlete_id, metric, start_date, end_date, activity_type=activity_type, limit=limit
+        )
+    except GroupNotFound as exc:
+        raise HTTPException(status_code=404, detail=str(exc)) from exc
+    except GroupForbidden as exc:
+        raise HTTPException(status_code=403, detail=str(exc)) from exc
+    except GroupError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+    me = LeaderboardEntry(rank=board.me[0], athlete_id=athlete_id, name=GROUPS.name_of(athlete_id), value=board.me[1])
+    return LeaderboardResponse(
+        group_id=group_id,
+        metric=metric,
+        unit=LEADERBOARD_METRICS[metric],
+        start=start_date.isoformat(),
+        end=end_date.isoformat(),
+        activity_type=activity_type,
+        members_count=board.members_count,
+        entries=[
+            LeaderboardEntry(rank=rank, athlete_id=agg.athlete_id, name=agg.name, value=value)
+            for rank, agg, value in board.entries
+        ],
+        me=me,
+        group_total=round(board.group_total, 2) if board.group_total is not None else None,
+    )
+
+
+@app.get("/api/routes/density", response_model=RouteDensityInfo)
+def route_density_info(request: Request):
+    session_id = get_session_id(request)
+    _get_activities_for_session(request)
+    density = CACHE[session_id].get("route_density")
+    if density is None:
+        return RouteDensityInfo(ready=False, activities_count=0, max_count=0, base_zoom=BASE_ZOOM, max_zoom=MAX_ZOOM)
+    bounds = density.bounds()
+    return RouteDensityInfo(
+        ready=True,
+        activities_count=len(density.activity_ids),
+        max_count=density.max_count,
+        base_zoom=BASE_ZOOM,
+        max_zoom=MAX_ZOOM,
+        tile_bounds=list(bounds) if bounds else None,
+    )
+
+
+@app.get("/api/routes/favourites", response_model=FavouriteRoutesResponse)
+def favourite_routes(
+    request: Request,
+    activity_type: str = "All",
+    start: Optional[str] = None,
+    end: Optional[str] = None,
+    limit: int = Query(default=10, ge=1, le=100),
+    min_count: int = Query(default=2, ge=1),
+):
+    activities = _get_activities_for_session(request)
+    return compute_favourite_routes(
+        activities,
+        activity_type=activity_type,
+        start=_parse_date_param(start),
+        end=_parse_date_param(end),
+        limit=limit,
+        min_count=min_count,
+    )
+
+
+@app.get("/api/routes/tiles/{z}/{x}/{y}")
+def route_density_tile(request: Request, z: int, x: int, y: int, format: str = "png"):
+    session_id = get_session_id(request)
+    _get_activities_for_session(request)
+    if format not in ("png", "bin"):
+        raise HTTPException(status_code=400, detail="Unsupported tile format")
+    if not 0 <= z <= MAX_ZOOM or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        raise HTTPException(status_code=404, detail="Tile out of range")
+    density = CACHE[session_id].get("route_density") or RouteDensity()
+    media_type = "image/png" if format == "png" else "application/octet-stream"
+    headers = {"Cache-Control": "private, max-age=300", "X-Density-Max": str(density.max_count)}
+    return Response(content=density.render(z, x, y, format), media_type=media_type, headers=headers)
+
+
+@app.get("/webhooks/strava")
+def strava_webhook_validation(
+    mode: str = Query(alias="hub.mode"),
+    verify_token: str = Query(alias="hub.verify_token"),
+    challenge: str = Query(alias="hub.challenge"),
+):
+    if mode != "subscribe" or not WEBHOOK_VERIFY_TOKEN or verify_token != WEBHOOK_VERIFY_TOKEN:
+        raise HTTPException(status_code=403, detail="Invalid verify token")
+    return {"hub.challenge": challenge}
+
+
+@app.post("/webhooks/strava")
+async def strava_webhook_event(request: Request, background_tasks: BackgroundTasks):
+    try:
+        event = await request.json()
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail="Invalid event payload") from exc
+    if not isinstance(event, dict):
+        raise HTTPException(status_code=400, detail="Invalid event payload")
+    if not is_subscribed_event(event):
+        raise HTTPException(status_code=403, detail="Unknown subscription")
+    # Strava expects a 200 within two seconds, so the fetch happens after responding.
+    background_tasks.add_task(process_event, event)
+    return {"status": "queued"}
+
+
+@app.on_event("startup")
+def warm_leaderboards():
+    # Rebuilding every member's day index from the store takes a while; do it
+    # off the request path so the first leaderboard request doesn't pay for it.
+    if store_enabled():
+        threading.Thread(target=GROUPS.warm, name="warm-leaderboards", daemon=True).start()
+
+
+@app.on_event("shutdown")
+def release_compute_resources():
+    flush_pending()
+    shutdown_pool()
+    for session in CACHE.values():
+        packed = session.get("packed_activities")
+        if packed is not None:
+            packed.release()
+
+
 @app.exception_handler(StravaError)
 async def strava_exception_handler(_: Request, exc: StravaError):
     return JSONResponse(status_code=400, content={"detail": str(exc)})
@@ -0,0 +1,114 @@
+import os
+import pickle
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, List, Optional
+
+from utils import compute_highlights, compute_summary, compute_trends, compute_wrapped
+
+# Worker processes for heavy compute_* calls; 0 keeps everything inline.
+COMPUTE_WORKERS = int(os.getenv("COMPUTE_WORKERS", "0"))
+# Sessions with fewer activities than this are computed inline even when the pool is on.
+OFFLOAD_THRESHOLD = int(os.getenv("COMPUTE_OFFLOAD_THRESHOLD", "5000"))
+_WORKER_CACHE_SIZE = 4
+
+COMPUTE_FUNCTIONS: Dict[str, Callable[..., Any]] = {
+    "summary": compute_summary,
+    "trends": compute_trends,
+    "highlights": compute_highlights,
+    "wrapped": compute_wrapped,
+}
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_lock = threading.Lock()
+_worker_cache: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+
+
+class PackedActivities:
+    """A session's activities stored column-wise in a shared memory block.
+
+    Workers attach by name and rebuild the row dicts once per block, so each
+    offloaded call only pickles the block name instead of every activity.
+    """
+
+    def __init__(self, activities: List[Dict[str, Any]]) -> None:
+        keys = sorted({k for a in activities for k in a})
+        columns = {k: [a.get(k) for a in activities] for k in keys}
+        payload = pickle.dumps((len(activities), columns), protocol=pickle.HIGHEST_PROTOCOL)
+        self.size = len(payload)
+        self._shm = shared_memory.SharedMemory(create=True, size=max(self.size, 1))
+        self._shm.buf[:self.size] = payload
+        self.name = self._shm.name
+
+    def release(self) -> None:
+        if self._shm is None:
+            return
+        self._shm.close()
+        try:
+            self._shm.unlink()
+        except FileNotFoundError:
+            pass
+        self._shm = None
+
+
+def _load_packed(name: str, size: int) -> List[Dict[str, Any]]:
+    activities = _worker_cache.get(name)
+    if activities is not None:
+        _worker_cache.move_to_end(name)
+        return activities
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        count, columns = pickle.loads(bytes(shm.buf[:size]))
+    finally:
+        shm.close()
+    activities = [{k: values[i] for k, values in columns.items()} for i in range(count)]
+    _worker_cache[name] = activities
+    while len(_worker_cache) > _WORKER_CACHE_SIZE:
+        _worker_cache.popitem(last=False)
+    return activities
+
+
+def _run_packed(func_name: str, name: str, size: int, kwargs: Dict[str, Any]) -> Any:
+    return COMPUTE_FUNCTIONS[func_name](_load_packed(name, size), **kwargs)
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    global _pool
+    if COMPUTE_WORKERS <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=COMPUTE_WORKERS)
+    return _pool
+
+
+def shutdown_pool() -> None:
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(cancel_futures=True)
+            _pool = None
+
+
+def run_compute(session: Dict[str, Any], func_name: str, **kwargs: Any) -> Any:
+    """Run ``COMPUTE_FUNCTIONS[func_name]`` over the session's activities.
+
+    Large sessions go to the process pool so the GIL stays free for other
+    requests; the packed shared memory copy is built once and kept on the session.
+    """
+    activities = session.get("activities") or []
+    pool = _get_pool()
+    if pool is None or len(activities) < OFFLOAD_THRESHOLD:
+        return COMPUTE_FUNCTIONS[func_name](activities, **kwargs)
+
+    with _pool_lock:
+        packed = session.get("packed_activities")
+        if packed is None:
+            packed = session["packed_activities"] = PackedActivities(activities)
+    try:
+        return pool.submit(_run_packed, func_name, packed.name, packed.size, kwargs).result()
+    except FileNotFoundError:
+        # The block was released by a concurrent re-sync; fall back to the fresh list.
+        return COMPUTE_FUNCTIONS[func_name](session.get("activities") or [], **kwargs)
@@ -0,0 +1,222 @@
+import math
+import struct
+import threading
+import zlib
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+import numpy as np
+
+TILE_SIZE = 256
+BASE_ZOOM = 13
+MAX_ZOOM = BASE_ZOOM + 3
+# Segments longer than this (in base-zoom pixels) are GPS jumps, not routes.
+MAX_SEGMENT_PX = 4096
+
+_WORLD_PX = TILE_SIZE * (1 << BASE_ZOOM)
+
+
+def decode_polyline(encoded: str) -> np.ndarray:
+    """Decode a Google encoded polyline into an ``(n, 2)`` array of lat/lng degrees."""
+    if not encoded:
+        return np.empty((0, 2), dtype=np.float64)
+    chars = np.frombuffer(encoded.encode("ascii"), dtype=np.uint8).astype(np.int64) - 63
+    is_last = chars < 0x20
+    if not is_last[-1]:
+        raise ValueError("Truncated polyline")
+    starts = np.flatnonzero(np.concatenate(([True], is_last[:-1])))
+    group = np.cumsum(np.concatenate(([0], is_last[:-1].astype(np.int64))))
+    shift = 5 * (np.arange(chars.size) - starts[group])
+    raw = np.add.reduceat((chars & 0x1F) << shift, starts)
+    deltas = np.where(raw & 1, ~(raw >> 1), raw >> 1)
+    if deltas.size % 2:
+        raise ValueError("Polyline has an odd number of values")
+    return np.cumsum(deltas.reshape(-1, 2), axis=0) / 1e5
+
+
+def encode_polyline(latlng: np.ndarray) -> str:
+    """Encode an ``(n, 2)`` array of lat/lng degrees as a Google polyline."""
+    if len(latlng) == 0:
+        return ""
+    scaled = np.round(np.asarray(latlng, dtype=np.float64) * 1e5).astype(np.int64)
+    deltas = np.diff(scaled, axis=0, prepend=np.zeros((1, 2), dtype=np.int64)).ravel()
+    values = np.where(deltas < 0, ~(deltas << 1), deltas << 1)
+    out: List[str] = []
+    for value in values.tolist():
+        while value >= 0x20:
+            out.append(chr((0x20 | (value & 0x1F)) + 63))
+            value >>= 5
+        out.append(chr(value + 63))
+    return "".join(out)
+
+
+def _project(latlng: np.ndarray) -> np.ndarray:
+    """Project lat/lng degrees to global Web Mercator pixel coordinates at ``BASE_ZOOM``."""
+    lat = np.radians(np.clip(latlng[:, 0], -85.0511, 85.0511))
+    x = (latlng[:, 1] + 180.0) / 360.0 * _WORLD_PX
+    y = (1.0 - np.log(np.tan(lat) + 1.0 / np.cos(lat)) / math.pi) / 2.0 * _WORLD_PX
+    return np.clip(np.stack([x, y], axis=1), 0, _WORLD_PX - 1)
+
+
+def _route_pixels(latlng: np.ndarray) -> np.ndarray:
+    """Unique base-zoom pixel keys (``x * world + y``) touched by one route."""
+    points = _project(latlng)
+    if len(points) == 1:
+        pixels = points.astype(np.int64)
+    else:
+        start = points[:-1]
+        delta = points[1:] - start
+        length = np.abs(delta).max(axis=1)
+        steps = np.where(length > MAX_SEGMENT_PX, 1, np.maximum(np.ceil(length), 1)).astype(np.int64)
+        seg = np.repeat(np.arange(len(start)), steps)
+        offsets = np.arange(seg.size) - np.repeat(np.cumsum(steps) - steps, steps)
+        frac = (offsets / steps[seg])[:, None]
+        samples = start[seg] + frac * delta[seg]
+        pixels = np.vstack([samples, points[-1:]]).astype(np.int64)
+    return np.unique(pixels[:, 0] * _WORLD_PX + pixels[:, 1])
+
+
+def _group_by_tile(pixel_keys: np.ndarray) -> Iterator[Tuple[Tuple[int, int], np.ndarray, np.ndarray, np.ndarray]]:
+    """Split pixel keys into ``((tx, ty), rows, cols, indices)`` per base-zoom tile."""
+    px, py = np.divmod(pixel_keys, _WORLD_PX)
+    tile_keys, inverse = np.unique((px // TILE_SIZE) * _WORLD_PX + py // TILE_SIZE, return_inverse=True)
+    order = np.argsort(inverse, kind="stable")
+    for tile_key, idx in zip(tile_keys, np.split(order, np.cumsum(np.bincount(inverse))[:-1])):
+        tx, ty = divmod(int(tile_key), _WORLD_PX)
+        yield (tx, ty), py[idx] % TILE_SIZE, px[idx] % TILE_SIZE, idx
+
+
+def _encode_png(alpha: np.ndarray, rgb: Tuple[int, int, int] = (252, 76, 2)) -> bytes:
+    height, width = alpha.shape
+    pixels = np.empty((height, width, 4), dtype=np.uint8)
+    pixels[..., :3] = rgb
+    pixels[..., 3] = alpha
+    raw = np.concatenate([np.zeros((height, 1), dtype=np.uint8), pixels.reshape(height, -1)], axis=1)
+
+    def chunk(tag: bytes, data: bytes) -> bytes:
+        return struct.pack(">I", len(data)) + tag + data + struct.pack(">I", zlib.crc32(tag + data) & 0xFFFFFFFF)
+
+    header = struct.pack(">IIBBBBB", width, height, 8, 6, 0, 0, 0)
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + chunk(b"IHDR", header)
+        + chunk(b"IDAT", zlib.compress(raw.tobytes(), 6))
+        + chunk(b"IEND", b"")
+    )
+
+
+class RouteDensity:
+    """Per-athlete route density grid stored as sparse base-zoom tiles.
+
+    Each pixel counts how many activities passed through it. Routes are added
+    incrementally, so a re-sync only rasterizes activities not seen before.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._tiles: Dict[Tuple[int, int], np.ndarray] = {}
+        self._rendered: Dict[Tuple[int, int, int, str], bytes] = {}
+        self.activity_ids: Set[int] = set()
+        self.max_count = 0
+
+    def add_activities(self, activities: Iterable[Dict[str, Any]]) -> int:
+        keys: List[np.ndarray] = []
+        new_ids: List[int] = []
+        for a in activities:
+            activity_id = a.get("id")
+            polyline = a.get("summary_polyline")
+            if activity_id is None or activity_id in self.activity_ids or not polyline:
+                continue
+            try:
+                latlng = decode_polyline(polyline)
+            except ValueError:
+                continue
+            new_ids.append(activity_id)
+            if len(latlng):
+                keys.append(_route_pixels(latlng))
+        if not new_ids:
+            return 0
+
+        with self._lock:
+            if keys:
+                pixel_keys, counts = np.unique(np.concatenate(keys), return_counts=True)
+                for (tx, ty), rows, cols, idx in _group_by_tile(pixel_keys):
+                    tile = self._tiles.get((tx, ty))
+                    if tile is None:
+                        tile = self._tiles[(tx, ty)] = np.zeros((TILE_SIZE, TILE_SIZE), dtype=np.uint32)
+                    tile[rows, cols] += counts[idx].astype(np.uint32)
+                    self.max_count = max(self.max_count, int(tile.max()))
+            self.activity_ids.update(new_ids)
+            self._rendered.clear()
+        return len(new_ids)
+
+    def remove_activities(self, activities: Iterable[Dict[str, Any]]) -> int:
+        """Subtract previously added routes, e.g. when an activity is deleted or edited."""
+        removed = 0
+        with self._lock:
+            for a in activities:
+                activity_id = a.get("id")
+                if activity_id not in self.activity_ids:
+                    continue
+                self.activity_ids.discard(activity_id)
+                removed += 1
+                try:
+                    latlng = decode_polyline(a.get("summary_polyline") or "")
+                except ValueError:
+                    continue
+                if not len(latlng):
+                    continue
+                for key, rows, cols, _ in _group_by_tile(_route_pixels(latlng)):
+                    tile = self._tiles.get(key)
+                    if tile is not None:
+                        tile[rows, cols] = np.maximum(tile[rows, cols], 1) - 1
+            if removed:
+                self.max_count = max((int(t.max()) for t in self._tiles.values()), default=0)
+                self._rendered.clear()
+        return removed
+
+    def bounds(self) -> Optional[Tuple[int, int, int, int]]:
+        """Base-zoom tile bounds as ``(min_x, min_y, max_x, max_y)``."""
+        if not self._tiles:
+            return None
+        xs = [t[0] for t in self._tiles]
+        ys = [t[1] for t in self._tiles]
+        return min(xs), min(ys), max(xs), max(ys)
+
+    def tile_counts(self, z: int, x: int, y: int) -> np.ndarray:
+        """Density for an XYZ tile; lower zooms keep the max count of the merged pixels."""
+        out = np.zeros((TILE_SIZE, TILE_SIZE), dtype=np.uint32)
+        if z > BASE_ZOOM:
+            factor = 1 << (z - BASE_ZOOM)
+            tile = self._tiles.get((x // factor, y // factor))
+            if tile is None:
+                return out
+            size = TILE_SIZE // factor
+            ox, oy = (x % factor) * size, (y % factor) * size
+            block = tile[oy:oy + size, ox:ox + size]
+            return block.repeat(factor, axis=0).repeat(factor, axis=1)
+
+        shift = BASE_ZOOM - z
+        for (tx, ty), tile in self._tiles.items():
+            if tx >> shift != x or ty >> shift != y:
+                continue
+            rows, cols = np.nonzero(tile)
+            gx = ((tx * TILE_SIZE + cols) >> shift) - x * TILE_SIZE
+            gy = ((ty * TILE_SIZE + rows) >> shift) - y * TILE_SIZE
+            np.maximum.at(out, (gy, gx), tile[rows, cols])
+        return out
+
+    def render(self, z: int, x: int, y: int, fmt: str = "png") -> bytes:
+        key = (z, x, y, fmt)
+        cached = self._rendered.get(key)
+        if cached is not None:
+            return cached
+        with self._lock:
+            counts = self.tile_counts(z, x, y)
+            if fmt == "png":
+                scale = math.log1p(self.max_count) or 1.0
+                alpha = (np.log1p(counts) / scale * 255).astype(np.uint8)
+                data = _encode_png(alpha)
+            else:
+                data = counts.astype("<u4").tobytes()
+            self._rendered[key] = data
+        return data
@@ -93,6 +93,23 @@ class HeatmapPoint(BaseModel):
     count: int
 
 
+class FavouriteRoute(BaseModel):
+    name: str
+    type: str
+    count: int
+    total_distance_km: float
+    best_time_minutes: Optional[float] = None
+    best_activity_id: Optional[int] = None
+    last_date: str
+    start_latlng: Optional[List[float]] = None
+    summary_polyline: Optional[str] = None
+    activity_ids: List[int]
+
+
+class FavouriteRoutesResponse(BaseModel):
+    routes: List[FavouriteRoute]
+
+
 class WrappedResponse(BaseModel):
     year: int
     key_stats: List[WrappedKeyStat]
@@ -113,6 +130,7 @@ class WrappedResponse(BaseModel):
 
     top_kudos_givers: List[Dict[str, Any]]
     favourite_partners: List[Dict[str, Any]]
+    favourite_routes: List[FavouriteRoute] = []
 
     cumulative_distance: List[Dict[str, Any]]
     monthly_distance: List[Dict[str, Any]]
@@ -121,3 +139,119 @@ class WrappedResponse(BaseModel):
     heatmap_points: List[HeatmapPoint]
 
     fun_lines: List[str]
+
+
+class RouteDensityInfo(BaseModel):
+    ready: bool
+    activities_count: int
+    max_count: int
+    base_zoom: int
+    max_zoom: int
+    tile_bounds: Optional[List[int]] = None
+
+
+class BestEffort(BaseModel):
+    label: str
+    value: float
+    unit: str
+    activity: ActivityHighlight
+
+
+class BestEffortsResponse(BaseModel):
+    distances: List[BestEffort]
+    power: List[BestEffort]
+    heartrate: List[BestEffort]
+    processed_activities: int
+    pending_activities: int
+    activity_type: str = "All"
+
+
+class TrainingLoadPoint(BaseModel):
+    date: str
+    load: float
+    acute_load: float
+    chronic_load: float
+    form: float
+    distance_7d_km: float
+    distance_28d_km: float
+    distance_365d_km: float
+    time_7d_hours: float
+    time_28d_hours: float
+    time_365d_hours: float
+
+
+class TrainingLoadResponse(BaseModel):
+    days: List[TrainingLoadPoint]
+    activity_type: str = "All"
+
+
+class RangeStatsResponse(BaseModel):
+    start: str
+    end: str
+    total_distance_km: float
+    total_time_hours: float
+    total_elevation_m: float
+    activities_count: int
+    active_days: int
+    active_days_percent: float
+    activity_type: str = "All"
+
+
+class HistogramBin(BaseModel):
+    lower: float
+    upper: float
+    count: int
+
+
+class MetricDistribution(BaseModel):
+    metric: str
+    unit: str
+    count: int
+    mean: Optional[float]
+    percentiles: Dict[str, Optional[float]]
+    histogram: List[HistogramBin]
+
+
+class DistributionsResponse(BaseModel):
+    distributions: List[MetricDistribution]
+    start: Optional[str] = None
+    end: Optional[str] = None
+    activity_type: str = "All"
+
+
+class LeaderboardEntry(BaseModel):
+    rank: int
+    athlete_id: int
+    name: str
+    value: float
+
+
+class LeaderboardResponse(BaseModel):
+    group_id: str
+    metric: str
+    unit: str
+    start: str
+    end: str
+    activity_type: str = "All"
+    members_count: int
+    entries: List[LeaderboardEntry]
+    me: Optional[LeaderboardEntry] = None
+    group_total: Optional[float] = None
+
+
+class GroupMembershipResponse(BaseModel):
+    group_id: str
+    joined: bool
+    members_count: int
+    groups: List[str]
+
+
+class CalendarResponse(BaseModel):
+    start: str
+    days: int
+    activity_type: str = "All"
+    encoding: str = "base64"
+    # Little-endian float32 / uint8 arrays, one value per day from ``start``.
+    distance_km: str
+    moving_time_minutes: str
+    activities_count: str
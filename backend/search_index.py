@@ -0,0 +1,123 @@
+import math
+import re
+import unicodedata
+from bisect import bisect_left
+from datetime import date
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+_TOKEN_RE = re.compile(r"\w+")
+EXACT_WEIGHT = 2.0
+PREFIX_WEIGHT = 1.0
+
+
+def tokenize(text: str) -> List[str]:
+    normalized = unicodedata.normalize("NFKD", text or "")
+    stripped = "".join(ch for ch in normalized if not unicodedata.combining(ch))
+    return _TOKEN_RE.findall(stripped.lower())
+
+
+class SearchIndex:
+    """Inverted token index over activity names with prefix lookup.
+
+    Postings map each token to activity ids; a sorted term list answers prefix
+    queries with a binary search, so lookups do not scan every activity.
+    """
+
+    def __init__(self) -> None:
+        self.postings: Dict[str, Set[int]] = {}
+        self.activities: Dict[int, Dict[str, Any]] = {}
+        self._doc_terms: Dict[int, Set[str]] = {}
+        self._terms: List[str] = []
+        self._terms_dirty = False
+
+    @classmethod
+    def build(cls, activities: List[Dict[str, Any]]) -> "SearchIndex":
+        index = cls()
+        for a in activities:
+            index.add(a)
+        return index
+
+    def add(self, activity: Dict[str, Any]) -> None:
+        activity_id = activity.get("id")
+        if activity_id is None:
+            return
+        if activity_id in self.activities:
+            self.remove(activity_id)
+        terms = set(tokenize(activity.get("name") or ""))
+        self.activities[activity_id] = activity
+        self._doc_terms[activity_id] = terms
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is None:
+                posting = self.postings[term] = set()
+                self._terms_dirty = True
+            posting.add(activity_id)
+
+    def remove(self, activity_id: int) -> None:
+        self.activities.pop(activity_id, None)
+        for term in self._doc_terms.pop(activity_id, set()):
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            posting.discard(activity_id)
+            if not posting:
+                del self.postings[term]
+                self._terms_dirty = True
+
+    def _expand(self, prefix: str) -> List[str]:
+        if self._terms_dirty:
+            self._terms = sorted(self.postings)
+            self._terms_dirty = False
+        start = bisect_left(self._terms, prefix)
+        end = bisect_left(self._terms, prefix + "\U0010ffff", lo=start)
+        return self._terms[start:end]
+
+    def _idf(self, term: str) -> float:
+        return math.log(1 + len(self.activities) / len(self.postings[term]))
+
+    def search(
+        self,
+        query: str = "",
+        activity_type: str = "All",
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        min_distance_km: Optional[float] = None,
+        max_distance_km: Optional[float] = None,
+        limit: int = 50,
+    ) -> List[Dict[str, Any]]:
+        """Activities matching every query token as a word or word prefix, best first."""
+        scores: Optional[Dict[int, float]] = None
+        for token in tokenize(query):
+            token_scores: Dict[int, float] = {}
+            for term in self._expand(token):
+                weight = (EXACT_WEIGHT if term == token else PREFIX_WEIGHT) * self._idf(term)
+                for activity_id in self.postings[term]:
+                    if weight > token_scores.get(activity_id, 0.0):
+                        token_scores[activity_id] = weight
+            if scores is None:
+                scores = token_scores
+            else:
+                scores = {i: s + token_scores[i] for i, s in scores.items() if i in token_scores}
+            if not scores:
+                return []
+        if scores is None:
+            scores = {activity_id: 0.0 for activity_id in self.activities}
+
+        first = start.isoformat() if start else None
+        last = end.isoformat() if end else None
+        results: List[Tuple[float, str, Dict[str, Any]]] = []
+        for activity_id, score in scores.items():
+            a = self.activities[activity_id]
+            if activity_type != "All" and a.get("type") != activity_type:
+                continue
+            day = (a.get("start_date_local") or a.get("start_date") or "")[:10]
+            if (first and day < first) or (last and day > last):
+                continue
+            distance_km = (a.get("distance") or 0) / 1000
+            if min_distance_km is not None and distance_km < min_distance_km:
+                continue
+            if max_distance_km is not None and distance_km > max_distance_km:
+                continue
+            results.append((score, a.get("start_date") or "", a))
+        results.sort(key=lambda r: (r[0], r[1]), reverse=True)
+        return [a for _, _, a in results[:limit]]
@@ -0,0 +1,229 @@
+import math
+from collections import defaultdict
+from datetime import date, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+RELATIVE_ACCURACY = 0.01
+
+
+class DDSketch:
+    """Mergeable quantile sketch with bounded relative error (DDSketch).
+
+    Positive values fall into logarithmic buckets ``gamma ** (i - 1) < x <= gamma ** i``;
+    every quantile is reported within ``relative_accuracy`` of an exact answer.
+    Sketches with the same accuracy merge by adding bucket counts, and values can
+    be removed again, which lets per-month sketches follow activity edits.
+    """
+
+    def __init__(self, relative_accuracy: float = RELATIVE_ACCURACY) -> None:
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = defaultdict(int)
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+
+    def _index(self, values: np.ndarray) -> np.ndarray:
+        return np.ceil(np.log(values) / self._log_gamma).astype(np.int64)
+
+    def _value(self, index: int) -> float:
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def add_many(self, values: Sequence[float], sign: int = 1) -> None:
+        arr = np.asarray(values, dtype=np.float64)
+        arr = arr[np.isfinite(arr) & (arr >= 0)]
+        if not arr.size:
+            return
+        positive = arr[arr > 0]
+        self.zero_count += sign * int(arr.size - positive.size)
+        if positive.size:
+            keys, counts = np.unique(self._index(positive), return_counts=True)
+            for key, n in zip(keys.tolist(), counts.tolist()):
+                self.bins[key] += sign * n
+                if self.bins[key] <= 0:
+                    del self.bins[key]
+        self.zero_count = max(self.zero_count, 0)
+        self.count = max(self.count + sign * int(arr.size), 0)
+        self.total += sign * float(arr.sum())
+
+    def add(self, value: float) -> None:
+        self.add_many([value])
+
+    def remove(self, value: float) -> None:
+        self.add_many([value], sign=-1)
+
+    def merge(self, other: "DDSketch") -> None:
+        if other.gamma != self.gamma:
+            raise ValueError("Cannot merge sketches with different accuracy")
+        for key, n in other.bins.items():
+            self.bins[key] += n
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.total += other.total
+
+    def _sorted_bins(self) -> Tuple[np.ndarray, np.ndarray]:
+        keys = np.array(sorted(self.bins), dtype=np.int64)
+        counts = np.array([self.bins[k] for k in keys.tolist()], dtype=np.int64)
+        return keys, counts
+
+    def quantiles(self, qs: Iterable[float]) -> List[Optional[float]]:
+        if self.count <= 0:
+            return [None for _ in qs]
+        keys, counts = self._sorted_bins()
+        cumulative = np.cumsum(counts) + self.zero_count
+        out: List[Optional[float]] = []
+        for q in qs:
+            rank = q * (self.count - 1)
+            if rank < self.zero_count or not keys.size:
+                out.append(0.0)
+                continue
+            pos = min(int(np.searchsorted(cumulative, rank, side="right")), keys.size - 1)
+            out.append(self._value(int(keys[pos])))
+        return out
+
+    def histogram(self, bins: int = 20) -> List[Tuple[float, float, int]]:
+        """Equal-width histogram between the smallest and largest bucket values."""
+        if self.count <= 0:
+            return []
+        keys, counts = self._sorted_bins()
+        values = [self._value(int(k)) for k in keys.tolist()]
+        weights = counts.tolist()
+        if self.zero_count:
+            values.append(0.0)
+            weights.append(self.zero_count)
+        values, weights = np.array(values), np.array(weights)
+        lo, hi = float(values.min()), float(values.max())
+        if hi <= lo:
+            return [(lo, hi, int(weights.sum()))]
+        hist, edges = np.histogram(values, bins=bins, range=(lo, hi), weights=weights)
+        return [(float(edges[i]), float(edges[i + 1]), int(hist[i])) for i in range(bins)]
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.total / self.count if self.count > 0 else None
+
+
+METRIC_UNITS = {"pace": "min/km", "speed": "km/h", "distance": "km", "duration": "min"}
+
+
+def _activity_metrics(activity: Dict[str, Any]) -> Dict[str, Optional[float]]:
+    distance = activity.get("distance") or 0
+    moving_time = activity.get("moving_time") or 0
+    return {
+        "pace": (moving_time / 60) / (distance / 1000) if distance > 0 and moving_time > 0 else None,
+        "speed": (distance / 1000) / (moving_time / 3600) if distance > 0 and moving_time > 0 else None,
+        "distance": distance / 1000 if distance > 0 else None,
+        "duration": moving_time / 60 if moving_time > 0 else None,
+    }
+
+
+def _month_key(activity: Dict[str, Any]) -> Optional[str]:
+    date_str = activity.get("start_date_local") or activity.get("start_date")
+    return date_str[:7] if date_str else None
+
+
+def partial_months(start: Optional[date], end: Optional[date]) -> List[str]:
+    """Months at the edges of ``start``..``end`` that the range covers only in part."""
+    months = []
+    if start and start.day != 1:
+        months.append(start.strftime("%Y-%m"))
+    if end and (end + timedelta(days=1)).day != 1:
+        months.append(end.strftime("%Y-%m"))
+    return months
+
+
+def edge_activities(
+    activities: List[Dict[str, Any]], activity_type: str, start: Optional[date], end: Optional[date]
+) -> List[Dict[str, Any]]:
+    """Activities inside ``start``..``end`` that fall in one of its partially covered months."""
+    months = set(partial_months(start, end))
+    if not months:
+        return []
+    first = start.isoformat() if start else ""
+    last = end.isoformat() if end else "9999-12-31"
+    selected = []
+    for a in activities:
+        if _month_key(a) not in months or (activity_type != "All" and a.get("type") != activity_type):
+            continue
+        day = (a.get("start_date_local") or a.get("start_date"))[:10]
+        if first <= day <= last:
+            selected.append(a)
+    return selected
+
+
+class DistributionStore:
+    """Per-month, per-type sketches of pace, speed, distance and duration."""
+
+    def __init__(self) -> None:
+        self.sketches: Dict[Tuple[str, str, str], DDSketch] = {}
+
+    @classmethod
+    def build(cls, activities: List[Dict[str, Any]]) -> "DistributionStore":
+        store = cls()
+        grouped: Dict[Tuple[str, str, str], List[float]] = defaultdict(list)
+        for a in activities:
+            month = _month_key(a)
+            if not month:
+                continue
+            for metric, value in _activity_metrics(a).items():
+                if value is not None:
+                    grouped[(a.get("type") or "", month, metric)].append(value)
+        for key, values in grouped.items():
+            sketch = store.sketches[key] = DDSketch()
+            sketch.add_many(np.array(values))
+        return store
+
+    def _update(self, activity: Dict[str, Any], sign: int) -> None:
+        month = _month_key(activity)
+        if not month:
+            return
+        for metric, value in _activity_metrics(activity).items():
+            if value is None:
+                continue
+            key = (activity.get("type") or "", month, metric)
+            sketch = self.sketches.get(key)
+            if sketch is None:
+                if sign < 0:
+                    continue
+                sketch = self.sketches[key] = DDSketch()
+            sketch.add_many([value], sign=sign)
+
+    def add_activity(self, activity: Dict[str, Any]) -> None:
+        self._update(activity, 1)
+
+    def remove_activity(self, activity: Dict[str, Any]) -> None:
+        self._update(activity, -1)
+
+    def merged(
+        self,
+        metric: str,
+        activity_type: str = "All",
+        start: Optional[date] = None,
+        end: Optional[date] = None,
+        edges: Optional[List[Dict[str, Any]]] = None,
+    ) -> DDSketch:
+        """Merge the monthly sketches for ``start``..``end``.
+
+        Without ``edges`` every month the range touches is merged whole. With
+        ``edges`` (see :func:`edge_activities`) the partially covered months
+        are built from those activities instead, so the result is exact to the day.
+        """
+        first = start.strftime("%Y-%m") if start else None
+        last = end.strftime("%Y-%m") if end else None
+        skipped = set(partial_months(start, end)) if edges is not None else set()
+        merged = DDSketch()
+        for (sketch_type, month, sketch_metric), sketch in self.sketches.items():
+            if sketch_metric != metric:
+                continue
+            if activity_type != "All" and sketch_type != activity_type:
+                continue
+            if (first and month < first) or (last and month > last) or month in skipped:
+                continue
+            merged.merge(sketch)
+        if edges:
+            values = [_activity_metrics(a)[metric] for a in edges]
+            merged.add_many([v for v in values if v is not None])
+        return merged
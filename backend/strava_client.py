@@ -1,19 +1,187 @@
+import hashlib
+import json
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 
 import requests
 
-STRAVA_AUTH_URL = "https://www.strava.com/oauth/authorize"
-STRAVA_TOKEN_URL = "https://www.strava.com/oauth/token"
-STRAVA_ACTIVITIES_URL = "https://www.strava.com/api/v3/athlete/activities"
-STRAVA_ACTIVITY_KUDOS_URL = "https://www.strava.com/api/v3/activities/{activity_id}/kudos"
+from http_cache import HttpCache, cache_key
+
+# Overridable so the load-test harness can point the client at a local fake server.
+STRAVA_OAUTH_BASE = os.getenv("STRAVA_OAUTH_BASE", "https://www.strava.com/oauth").rstrip("/")
+STRAVA_API_BASE = os.getenv("STRAVA_API_BASE", "https://www.strava.com/api/v3").rstrip("/")
+
+STRAVA_AUTH_URL = f"{STRAVA_OAUTH_BASE}/authorize"
+STRAVA_TOKEN_URL = f"{STRAVA_OAUTH_BASE}/token"
+STRAVA_ACTIVITIES_URL = f"{STRAVA_API_BASE}/athlete/activities"
+STRAVA_ACTIVITY_URL = STRAVA_API_BASE + "/activities/{activity_id}"
+STRAVA_ACTIVITY_KUDOS_URL = STRAVA_API_BASE + "/activities/{activity_id}/kudos"
+STRAVA_ACTIVITY_STREAMS_URL = STRAVA_API_BASE + "/activities/{activity_id}/streams"
+
+STREAM_KEYS = ("time", "distance", "watts", "heartrate")
+STREAM_FETCH_CONCURRENCY = int(os.getenv("STRAVA_STREAM_CONCURRENCY", "4"))
+
+_DATA_DIR = Path(__file__).resolve().parent / "data"
+# "cache" (default) keeps detail responses on disk, "off" disables that,
+# "record" saves every Strava response to the cassette and "replay" answers
+# only from the cassette, without network access.
+HTTP_CACHE_MODE = os.getenv("STRAVA_HTTP_CACHE", "cache")
+HTTP_CACHE_PATH = os.getenv("STRAVA_HTTP_CACHE_PATH", str(_DATA_DIR / "strava_http_cache.sqlite"))
+HTTP_CACHE_MAX_MB = float(os.getenv("STRAVA_HTTP_CACHE_MAX_MB", "256"))
+HTTP_CASSETTE_PATH = os.getenv("STRAVA_HTTP_CASSETTE", str(_DATA_DIR / "strava_cassette.sqlite"))
+
+# Seconds a cached response is served without asking Strava. Endpoints not
+# listed here are never cached outside record/replay.
+ENDPOINT_TTLS: Dict[str, float] = {
+    "kudos": 24 * 3600,
+    "activity": 3600,
+    "streams": 30 * 24 * 3600,
+}
+# Never part of a cache key, so cassettes do not depend on the app secret.
+_UNKEYED_FIELDS = ("client_secret",)
+# Token-endpoint fields replaced by placeholders before a response is recorded.
+_SECRET_FIELDS = ("access_token", "refresh_token")
+_REDACTED_PREFIX = "redacted-"
+
+_cache: Optional[HttpCache] = None
+# (15-minute window number, limit, usage) from the latest X-RateLimit-* headers.
+_rate_window: Optional[Tuple[int, int, int]] = None
 
 
 class StravaError(Exception):
     pass
 
 
+def _http_cache() -> HttpCache:
+    global _cache
+    if _cache is None:
+        if HTTP_CACHE_MODE in ("record", "replay"):
+            _cache = HttpCache(HTTP_CASSETTE_PATH)
+        else:
+            _cache = HttpCache(HTTP_CACHE_PATH, max_bytes=int(HTTP_CACHE_MAX_MB * 1024 * 1024))
+    return _cache
+
+
+def _note_rate_limit(headers: Any) -> None:
+    global _rate_window
+    limit, usage = headers.get("X-RateLimit-Limit"), headers.get("X-RateLimit-Usage")
+    if not limit or not usage:
+        return
+    try:
+        _rate_window = (int(time.time() // 900), int(limit.split(",")[0]), int(usage.split(",")[0]))
+    except ValueError:
+        pass
+
+
+def rate_limit_remaining() -> Optional[int]:
+    """Calls left in Strava's current 15-minute window, or None if not known.
+
+    Strava resets the short-term limit on the quarter hour, so a reading from
+    an earlier window says nothing about this one.
+    """
+    if _rate_window is None or _rate_window[0] != int(time.time() // 900):
+        return None
+    _, limit, usage = _rate_window
+    return max(limit - usage, 0)
+
+
+def _redact(token: str) -> str:
+    """A stable stand-in for ``token``; placeholders map to themselves.
+
+    Keys are computed on placeholders too, so a replay that only ever sees the
+    recorded placeholders finds the entries recorded with the real tokens.
+    """
+    if token.startswith(_REDACTED_PREFIX):
+        return token
+    return _REDACTED_PREFIX + hashlib.sha256(token.encode()).hexdigest()[:16]
+
+
+def _redact_token_response(content: bytes) -> bytes:
+    # Replay only needs the shape: placeholder tokens and the athlete id.
+    try:
+        payload = json.loads(content)
+    except ValueError:
+        return content
+    if not isinstance(payload, dict):
+        return content
+    for field in _SECRET_FIELDS:
+        if isinstance(payload.get(field), str):
+            payload[field] = _redact(payload[field])
+    if isinstance(payload.get("athlete"), dict):
+        payload["athlete"] = {"id": payload["athlete"].get("id")}
+    return json.dumps(payload).encode()
+
+
+def _key_url(url: str) -> str:
+    # Relative to the configured bases, so a cassette replays against any host.
+    for prefix, base in (("api:", STRAVA_API_BASE), ("oauth:", STRAVA_OAUTH_BASE)):
+        if url.startswith(base):
+            return prefix + url[len(base):]
+    return url
+
+
+def _request(
+    method: str,
+    url: str,
+    endpoint: str,
+    access_token: Optional[str] = None,
+    params: Optional[Dict[str, Any]] = None,
+    data: Optional[Dict[str, Any]] = None,
+    athlete_id: Optional[int] = None,
+    revalidate: bool = False,
+    timeout: float = 20,
+) -> Any:
+    """Send one Strava request through the on-disk cache / cassette.
+
+    Cached entries are scoped to the athlete (or, without an id, the token) so
+    one athlete's responses are never served to another. Stale entries with an
+    ETag are revalidated with ``If-None-Match``; ``revalidate`` forces that
+    check even for fresh entries.
+    """
+    headers = {"Authorization": f"Bearer {access_token}"} if access_token else {}
+    if athlete_id is not None:
+        scope = f"athlete:{athlete_id}"
+    elif access_token:
+        scope = "token:" + _redact(access_token)
+    else:
+        scope = "-"
+    keyed = {k: v for k, v in {**(params or {}), **(data or {})}.items() if k not in _UNKEYED_FIELDS}
+    for field in _SECRET_FIELDS:
+        if isinstance(keyed.get(field), str):
+            keyed[field] = _redact(keyed[field])
+    key = cache_key(method, _key_url(url), keyed, scope)
+
+    if HTTP_CACHE_MODE == "replay":
+        entry = _http_cache().get(key)
+        if entry is None:
+            raise StravaError(f"No recorded response for {method} {url}")
+        return entry.response()
+
+    ttl = ENDPOINT_TTLS.get(endpoint) if HTTP_CACHE_MODE == "cache" else None
+    entry = _http_cache().get(key) if ttl is not None else None
+    if entry is not None:
+        if entry.fresh and not revalidate:
+            return entry.response()
+        if entry.etag:
+            headers["If-None-Match"] = entry.etag
+
+    resp = requests.request(method, url, headers=headers, params=params, data=data, timeout=timeout)
+    _note_rate_limit(resp.headers)
+    if resp.status_code == 304 and entry is not None:
+        _http_cache().refresh(key, ttl)
+        return entry.response()
+    if HTTP_CACHE_MODE == "record":
+        content = _redact_token_response(resp.content) if endpoint == "token" else resp.content
+        _http_cache().put(key, url, resp.status_code, content, resp.headers, None)
+    elif ttl is not None and resp.status_code == 200:
+        _http_cache().put(key, url, resp.status_code, resp.content, resp.headers, ttl)
+    return resp
+
+
 def get_env_config() -> Dict[str, str]:
     client_id = os.getenv("STRAVA_CLIENT_ID")
     client_secret = os.getenv("STRAVA_CLIENT_SECRET")
@@ -47,7 +215,7 @@ def exchange_code_for_token(code: str) -> Dict[str, Any]:
         "code": code,
         "grant_type": "authorization_code",
     }
-    resp = requests.post(STRAVA_TOKEN_URL, data=payload, timeout=20)
+    resp = _request("POST", STRAVA_TOKEN_URL, "token", data=payload)
     if resp.status_code != 200:
         raise StravaError(f"Failed to exchange code: {resp.text}")
     return resp.json()
@@ -61,7 +229,7 @@ def refresh_access_token(refresh_token: str) -> Dict[str, Any]:
         "grant_type": "refresh_token",
         "refresh_token": refresh_token,
     }
-    resp = requests.post(STRAVA_TOKEN_URL, data=payload, timeout=20)
+    resp = _request("POST", STRAVA_TOKEN_URL, "token", data=payload)
     if resp.status_code != 200:
         raise StravaError(f"Failed to refresh token: {resp.text}")
     return resp.json()
@@ -72,8 +240,7 @@ def fetch_activities(access_token: str, after_ts: int) -> List[Dict[str, Any]]:
     page = 1
     while True:
         params = {"after": after_ts, "per_page": 100, "page": page}
-        headers = {"Authorization": f"Bearer {access_token}"}
-        resp = requests.get(STRAVA_ACTIVITIES_URL, headers=headers, params=params, timeout=30)
+        resp = _request("GET", STRAVA_ACTIVITIES_URL, "activities", access_token, params=params, timeout=30)
         if resp.status_code == 401:
             raise StravaError("Unauthorized when fetching activities.")
         if resp.status_code != 200:
@@ -86,11 +253,29 @@ def fetch_activities(access_token: str, after_ts: int) -> List[Dict[str, Any]]:
     return activities
 
 
+def fetch_activity(
+    access_token: str,
+    activity_id: int,
+    athlete_id: Optional[int] = None,
+    revalidate: bool = False,
+) -> Optional[Dict[str, Any]]:
+    url = STRAVA_ACTIVITY_URL.format(activity_id=activity_id)
+    resp = _request("GET", url, "activity", access_token, athlete_id=athlete_id, revalidate=revalidate)
+    if resp.status_code == 401:
+        raise StravaError("Unauthorized when fetching activity.")
+    if resp.status_code == 404:
+        return None
+    if resp.status_code != 200:
+        raise StravaError(f"Error fetching activity: {resp.text}")
+    return resp.json()
+
+
 def ensure_fresh_token(tokens: Dict[str, Any]) -> Dict[str, Any]:
     expires_at: Optional[int] = tokens.get("expires_at") if tokens else None
     if expires_at and expires_at < int(datetime.utcnow().timestamp()):
         refreshed = refresh_access_token(tokens.get("refresh_token"))
         return {
+            **tokens,
             "access_token": refreshed.get("access_token"),
             "refresh_token": refreshed.get("refresh_token", tokens.get("refresh_token")),
             "expires_at": refreshed.get("expires_at"),
@@ -98,21 +283,64 @@ def ensure_fresh_token(tokens: Dict[str, Any]) -> Dict[str, Any]:
     return tokens
 
 
-def fetch_activity_kudos(access_token: str, activity_id: int) -> List[Dict[str, Any]]:
-    headers = {"Authorization": f"Bearer {access_token}"}
+def fetch_activity_kudos(
+    access_token: str, activity_id: int, athlete_id: Optional[int] = None
+) -> List[Dict[str, Any]]:
     page = 1
     kudos: List[Dict[str, Any]] = []
     while True:
         params = {"per_page": 100, "page": page}
         url = STRAVA_ACTIVITY_KUDOS_URL.format(activity_id=activity_id)
-        resp = requests.get(url, headers=headers, params=params, timeout=20)
+        resp = _request("GET", url, "kudos", access_token, params=params, athlete_id=athlete_id)
         if resp.status_code == 401:
             raise StravaError("Unauthorized when fetching kudos.")
         if resp.status_code != 200:
             raise StravaError(f"Error fetching kudos: {resp.text}")
         data = resp.json()
-        if not data:
-            break
         kudos.extend(data)
+        # A short page is the last one; skipping the empty probe halves calls per activity.
+        if len(data) < params["per_page"]:
+            break
         page += 1
     return kudos
+
+
+def fetch_activity_streams(
+    access_token: str, activity_id: int, athlete_id: Optional[int] = None
+) -> Dict[str, List[Any]]:
+    params = {"keys": ",".join(STREAM_KEYS), "key_by_type": "true"}
+    url = STRAVA_ACTIVITY_STREAMS_URL.format(activity_id=activity_id)
+    resp = _request("GET", url, "streams", access_token, params=params, athlete_id=athlete_id, timeout=30)
+    if resp.status_code == 401:
+        raise StravaError("Unauthorized when fetching streams.")
+    if resp.status_code == 404:
+        return {}
+    if resp.status_code != 200:
+        raise StravaError(f"Error fetching streams: {resp.text}")
+    data = resp.json()
+    if isinstance(data, list):
+        data = {stream.get("type"): stream for stream in data}
+    return {key: stream.get("data") or [] for key, stream in data.items() if key in STREAM_KEYS}
+
+
+def fetch_streams_for_activities(
+    access_token: str,
+    activity_ids: List[int],
+    max_workers: int = STREAM_FETCH_CONCURRENCY,
+    athlete_id: Optional[int] = None,
+) -> Dict[int, Dict[str, List[Any]]]:
+    """Fetch streams for several activities with at most ``max_workers`` requests in flight.
+
+    Activities whose fetch fails are left out so they can be retried later.
+    """
+    results: Dict[int, Dict[str, List[Any]]] = {}
+    if not activity_ids:
+        return results
+    with ThreadPoolExecutor(max_workers=max(1, max_workers)) as pool:
+        futures = {pool.submit(fetch_activity_streams, access_token, i, athlete_id): i for i in activity_ids}
+        for future, activity_id in futures.items():
+            try:
+                results[activity_id] = future.result()
+            except StravaError:
+                continue
+    return results
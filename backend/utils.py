@@ -1,16 +1,33 @@
+import base64
 from collections import Counter, defaultdict
 from datetime import datetime, timedelta
 from typing import Any, Dict, List, Optional, Tuple
 
+import numpy as np
+
+from day_index import DayIndex, RangeTotals, ewma, rolling_sum
+from favourite_routes import cluster_routes, summarize_route
+from sketches import METRIC_UNITS, DistributionStore, edge_activities
 from schemas import (
     ActivityHighlight,
+    BestEffort,
+    BestEffortsResponse,
+    CalendarResponse,
     FactsResponse,
+    FavouriteRoute,
+    FavouriteRoutesResponse,
     HighlightsResponse,
     HeatmapPoint,
+    RangeStatsResponse,
     SummaryResponse,
+    TrainingLoadPoint,
+    TrainingLoadResponse,
     TrendPoint,
     TrendsResponse,
     DailyPoint,
+    DistributionsResponse,
+    HistogramBin,
+    MetricDistribution,
     WrappedActivity,
     WrappedKeyStat,
     WrappedResponse,
@@ -60,6 +77,25 @@ def _filter_by_type(activities: List[Dict[str, Any]], activity_type: str) -> Lis
     return [a for a in activities if a.get("type") == activity_type]
 
 
+def simplify_activity(activity: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "id": activity.get("id"),
+        "name": activity.get("name"),
+        "type": activity.get("type"),
+        "start_date_local": activity.get("start_date_local") or activity.get("start_date"),
+        "start_date": activity.get("start_date"),
+        "distance": activity.get("distance"),
+        "moving_time": activity.get("moving_time"),
+        "total_elevation_gain": activity.get("total_elevation_gain"),
+        "average_speed": activity.get("average_speed"),
+        "kudos_count": activity.get("kudos_count"),
+        "start_latlng": activity.get("start_latlng"),
+        "end_latlng": activity.get("end_latlng"),
+        "athlete_count": activity.get("athlete_count"),
+        "summary_polyline": (activity.get("map") or {}).get("summary_polyline"),
+    }
+
+
 def build_activity_highlight(activity: Dict[str, Any]) -> ActivityHighlight:
     avg_speed_ms = activity.get("average_speed")
     avg_speed_kmh = round(avg_speed_ms * 3.6, 2) if avg_speed_ms else None
@@ -304,12 +340,7 @@ def compute_facts(summary: SummaryResponse) -> FactsResponse:
     return FactsResponse(facts=facts)
 
 
-def compute_wrapped(
-    activities: List[Dict[str, Any]],
-    activity_type: str = "All",
-    tokens: Optional[Dict[str, Any]] = None,
-) -> WrappedResponse:
-    year = datetime.utcnow().year
+def wrapped_activities(activities: List[Dict[str, Any]], activity_type: str, year: int) -> List[Dict[str, Any]]:
     filtered: List[Dict[str, Any]] = []
     for a in activities:
         date_obj = _parse_activity_date(a)
@@ -318,6 +349,47 @@ def compute_wrapped(
         if activity_type != "All" and a.get("type") != activity_type:
             continue
         filtered.append(a)
+    return filtered
+
+
+def compute_kudos_givers(activities: List[Dict[str, Any]], tokens: Optional[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Top three kudos givers across the five most cheered of ``activities`` (Strava calls)."""
+    kudos_candidates = [a for a in activities if a.get("kudos_count")]
+    if not tokens or not kudos_candidates:
+        return []
+    try:
+        from strava_client import StravaError, fetch_activity_kudos
+
+        kudos_counts: Counter[str] = Counter()
+        candidate_subset = sorted(
+            kudos_candidates, key=lambda a: a.get("kudos_count", 0), reverse=True
+        )[:5]
+        for activity in candidate_subset:
+            try:
+                kudos_list = fetch_activity_kudos(
+                    tokens.get("access_token"), activity.get("id"), athlete_id=tokens.get("athlete_id")
+                )
+            except StravaError:
+                continue
+            for giver in kudos_list:
+                name = f"{giver.get('firstname', '')} {giver.get('lastname', '')}".strip() or "Friend"
+                kudos_counts[name] += 1
+        return [
+            {"name": name, "count": count}
+            for name, count in kudos_counts.most_common(3)
+        ]
+    except Exception:
+        return []
+
+
+def compute_wrapped(
+    activities: List[Dict[str, Any]],
+    activity_type: str = "All",
+    tokens: Optional[Dict[str, Any]] = None,
+    year: Optional[int] = None,
+) -> WrappedResponse:
+    year = year or datetime.utcnow().year
+    filtered = wrapped_activities(activities, activity_type, year)
 
     if not filtered:
         return WrappedResponse(
@@ -452,32 +524,8 @@ def compute_wrapped(
         for (lat, lng), count in heatmap_counter.items()
     ]
 
-    top_kudos_givers: List[Dict[str, Any]] = []
-    favourite_partners: List[Dict[str, Any]] = []
-    if tokens and kudos_candidates:
-        try:
-            from strava_client import StravaError, fetch_activity_kudos
-
-            kudos_counts: Counter[str] = Counter()
-            candidate_subset = sorted(
-                kudos_candidates, key=lambda a: a.get("kudos_count", 0), reverse=True
-            )[:5]
-            for activity in candidate_subset:
-                try:
-                    kudos_list = fetch_activity_kudos(tokens.get("access_token"), activity.get("id"))
-                except StravaError:
-                    continue
-                for giver in kudos_list:
-                    name = f"{giver.get('firstname', '')} {giver.get('lastname', '')}".strip() or "Friend"
-                    kudos_counts[name] += 1
-            top_kudos_givers = [
-                {"name": name, "count": count}
-                for name, count in kudos_counts.most_common(3)
-            ]
-            favourite_partners = top_kudos_givers[:]
-        except Exception:
-            top_kudos_givers = []
-            favourite_partners = []
+    top_kudos_givers = compute_kudos_givers(filtered, tokens)
+    favourite_partners = top_kudos_givers[:]
 
     total_distance_km = _meters_to_km(total_distance)
     total_time_hours = _seconds_to_hours(total_time)
@@ -521,6 +569,11 @@ def compute_wrapped(
         fun_lines.append(
             f"You earned {most_kudos_activity.kudos_count or 0} kudos on your most cheered activity."
         )
+    favourite_routes = compute_favourite_routes(filtered, limit=3).routes
+    if favourite_routes:
+        fun_lines.append(
+            f"Your favourite route, {favourite_routes[0].name}, saw you {favourite_routes[0].count} times."
+        )
 
     return WrappedResponse(
         year=year,
@@ -539,9 +592,338 @@ def compute_wrapped(
         most_kudos_activity=most_kudos_activity,
         top_kudos_givers=top_kudos_givers,
         favourite_partners=favourite_partners,
+        favourite_routes=favourite_routes,
         cumulative_distance=cumulative_distance,
         monthly_distance=monthly_distance_list,
         time_of_day_distribution=time_of_day_distribution,
         heatmap_points=heatmap_points,
         fun_lines=fun_lines,
     )
+
+
+RUN_TYPES = {"Run", "TrailRun", "VirtualRun"}
+RIDE_TYPES = {"Ride", "VirtualRide", "GravelRide", "MountainBikeRide"}
+# Running distances, so only RUN_TYPES compete for them; a ride's 5k is not a 5k PR.
+BEST_EFFORT_DISTANCES: Dict[str, float] = {
+    "400m": 400.0,
+    "1k": 1000.0,
+    "1 mile": 1609.34,
+    "5k": 5000.0,
+    "10k": 10000.0,
+    "Half marathon": 21097.5,
+    "Marathon": 42195.0,
+}
+BEST_EFFORT_DURATIONS: Dict[str, int] = {
+    "1 min": 60,
+    "5 min": 300,
+    "20 min": 1200,
+    "60 min": 3600,
+}
+
+
+def _stream_array(streams: Dict[str, List[Any]], key: str) -> Optional[np.ndarray]:
+    data = streams.get(key)
+    if not data:
+        return None
+    return np.array([v if v is not None else 0 for v in data], dtype=np.float64)
+
+
+def _best_distance_time(time: np.ndarray, distance: np.ndarray, target: float) -> Optional[float]:
+    """Fastest elapsed time covering ``target`` metres.
+
+    Both streams are monotonic, so ``searchsorted`` gives every window end at once;
+    the crossing point is interpolated inside the sample where the target is reached.
+    """
+    goal = distance + target
+    end = np.searchsorted(distance, goal, side="left")
+    valid = end < distance.size
+    if not valid.any():
+        return None
+    start_idx = np.flatnonzero(valid)
+    end = end[valid]
+    prev = end - 1
+    frac = (goal[valid] - distance[prev]) / (distance[end] - distance[prev])
+    end_time = time[prev] + frac * (time[end] - time[prev])
+    return float((end_time - time[start_idx]).min())
+
+
+def _best_duration_average(time: np.ndarray, values: np.ndarray, window: int) -> Optional[float]:
+    """Best average of ``values`` over any ``window`` seconds, holding each sample until the next."""
+    if time[-1] - time[0] < window:
+        return None
+    cumulative = np.concatenate(([0.0], np.cumsum(values[:-1] * np.diff(time))))
+    goal = time + window
+    end = np.searchsorted(time, goal, side="left")
+    valid = end < time.size
+    start_idx = np.flatnonzero(valid)
+    prev = end[valid] - 1
+    end_total = cumulative[prev] + values[prev] * (goal[valid] - time[prev])
+    return float((end_total - cumulative[start_idx]).max() / window)
+
+
+def compute_activity_best_efforts(streams: Dict[str, List[Any]]) -> Dict[str, Dict[str, float]]:
+    result: Dict[str, Dict[str, float]] = {"distance": {}, "watts": {}, "heartrate": {}}
+    time = _stream_array(streams, "time")
+    if time is None or time.size < 2:
+        return result
+
+    distance = _stream_array(streams, "distance")
+    if distance is not None and distance.size == time.size:
+        distance = np.maximum.accumulate(distance)
+        for label, target in BEST_EFFORT_DISTANCES.items():
+            if distance[-1] - distance[0] < target:
+                continue
+            best = _best_distance_time(time, distance, target)
+            if best is not None:
+                result["distance"][label] = round(best, 1)
+
+    for key in ("watts", "heartrate"):
+        values = _stream_array(streams, key)
+        if values is None or values.size != time.size:
+            continue
+        for label, window in BEST_EFFORT_DURATIONS.items():
+            best = _best_duration_average(time, values, window)
+            if best is not None:
+                result[key][label] = round(best, 1)
+    return result
+
+
+def compute_best_efforts(
+    activities: List[Dict[str, Any]],
+    efforts_by_activity: Dict[int, Dict[str, Dict[str, float]]],
+    activity_type: str = "All",
+    pending_activities: int = 0,
+) -> BestEffortsResponse:
+    filtered = _filter_by_type(activities, activity_type)
+    best: Dict[str, Dict[str, Tuple[float, Dict[str, Any]]]] = {"distance": {}, "watts": {}, "heartrate": {}}
+    processed = 0
+    for a in filtered:
+        efforts = efforts_by_activity.get(a.get("id"))
+        if efforts is None:
+            continue
+        processed += 1
+        for metric, values in efforts.items():
+            if metric == "distance" and a.get("type") not in RUN_TYPES:
+                continue
+            for label, value in values.items():
+                current = best[metric].get(label)
+                if current is None:
+                    best[metric][label] = (value, a)
+                elif (value < current[0]) if metric == "distance" else (value > current[0]):
+                    best[metric][label] = (value, a)
+
+    def to_list(metric: str, labels: List[str], unit: str) -> List[BestEffort]:
+        return [
+            BestEffort(
+                label=label,
+                value=best[metric][label][0],
+                unit=unit,
+                activity=build_activity_highlight(best[metric][label][1]),
+            )
+            for label in labels
+            if label in best[metric]
+        ]
+
+    return BestEffortsResponse(
+        distances=to_list("distance", list(BEST_EFFORT_DISTANCES), "s"),
+        power=to_list("watts", list(BEST_EFFORT_DURATIONS), "W"),
+        heartrate=to_list("heartrate", list(BEST_EFFORT_DURATIONS), "bpm"),
+        processed_activities=processed,
+        pending_activities=pending_activities,
+        activity_type=activity_type,
+    )
+
+
+ACUTE_LOAD_DAYS = 7
+CHRONIC_LOAD_DAYS = 42
+# Duration-based load: an hour of moving time scores 100, like an hour at threshold in TSS.
+LOAD_PER_HOUR = 100.0
+
+
+def compute_training_load(
+    day_index: DayIndex,
+    activity_type: str = "All",
+    start: Optional[datetime.date] = None,
+    end: Optional[datetime.date] = None,
+) -> TrainingLoadResponse:
+    series = day_index.get(activity_type)
+    load = series.moving_time / 3600 * LOAD_PER_HOUR
+    atl = ewma(load, ACUTE_LOAD_DAYS)
+    ctl = ewma(load, CHRONIC_LOAD_DAYS)
+    distance_km = series.distance / 1000
+    hours = series.moving_time / 3600
+    rolling = {
+        window: (rolling_sum(distance_km, window), rolling_sum(hours, window))
+        for window in (7, 28, 365)
+    }
+
+    first = max(day_index.offset(start), 0) if start else 0
+    last = min(day_index.offset(end), day_index.days - 1) if end else day_index.days - 1
+    if last < first:
+        return TrainingLoadResponse(days=[], activity_type=activity_type)
+
+    window = slice(first, last + 1)
+    columns = zip(
+        np.round(load[window], 1).tolist(),
+        np.round(atl[window], 1).tolist(),
+        np.round(ctl[window], 1).tolist(),
+        np.round(ctl[window] - atl[window], 1).tolist(),
+        *(np.round(rolling[w][0][window], 2).tolist() for w in (7, 28, 365)),
+        *(np.round(rolling[w][1][window], 2).tolist() for w in (7, 28, 365)),
+    )
+    days = [
+        TrainingLoadPoint(
+            date=day_index.date_at(first + i).isoformat(),
+            load=values[0],
+            acute_load=values[1],
+            chronic_load=values[2],
+            form=values[3],
+            distance_7d_km=values[4],
+            distance_28d_km=values[5],
+            distance_365d_km=values[6],
+            time_7d_hours=values[7],
+            time_28d_hours=values[8],
+            time_365d_hours=values[9],
+        )
+        for i, values in enumerate(columns)
+    ]
+    return TrainingLoadResponse(days=days, activity_type=activity_type)
+
+
+def build_range_stats(
+    totals: RangeTotals,
+    start: datetime.date,
+    end: datetime.date,
+    activity_type: str = "All",
+) -> RangeStatsResponse:
+    return RangeStatsResponse(
+        start=start.isoformat(),
+        end=end.isoformat(),
+        total_distance_km=_meters_to_km(totals.distance),
+        total_time_hours=_seconds_to_hours(totals.moving_time),
+        total_elevation_m=round(totals.elevation, 2),
+        activities_count=totals.count,
+        active_days=totals.active_days,
+        active_days_percent=round((totals.active_days / totals.days) * 100, 2) if totals.days else 0.0,
+        activity_type=activity_type,
+    )
+
+
+DISTRIBUTION_PERCENTILES = (5, 10, 25, 50, 75, 90, 95)
+
+
+def compute_distributions(
+    store: DistributionStore,
+    activities: List[Dict[str, Any]],
+    activity_type: str = "All",
+    start: Optional[datetime.date] = None,
+    end: Optional[datetime.date] = None,
+    bins: int = 20,
+) -> DistributionsResponse:
+    # Monthly sketches cover whole months; days of partly covered edge months come from the activities.
+    edges = edge_activities(activities, activity_type, start, end)
+    distributions = []
+    for metric, unit in METRIC_UNITS.items():
+        sketch = store.merged(metric, activity_type=activity_type, start=start, end=end, edges=edges)
+        values = sketch.quantiles([p / 100 for p in DISTRIBUTION_PERCENTILES])
+        distributions.append(
+            MetricDistribution(
+                metric=metric,
+                unit=unit,
+                count=sketch.count,
+                mean=round(sketch.mean, 2) if sketch.mean is not None else None,
+                percentiles={
+                    f"p{p}": round(v, 2) if v is not None else None
+                    for p, v in zip(DISTRIBUTION_PERCENTILES, values)
+                },
+                histogram=[
+                    HistogramBin(lower=round(lo, 2), upper=round(hi, 2), count=n)
+                    for lo, hi, n in sketch.histogram(bins)
+                ],
+            )
+        )
+    return DistributionsResponse(
+        distributions=distributions,
+        start=start.isoformat() if start else None,
+        end=end.isoformat() if end else None,
+        activity_type=activity_type,
+    )
+
+
+def compute_favourite_routes(
+    activities: List[Dict[str, Any]],
+    activity_type: str = "All",
+    start: Optional[datetime.date] = None,
+    end: Optional[datetime.date] = None,
+    limit: int = 10,
+    min_count: int = 2,
+) -> FavouriteRoutesResponse:
+    first = start.isoformat() if start else None
+    last = end.isoformat() if end else None
+    selected = []
+    for a in _filter_by_type(activities, activity_type):
+        day = (a.get("start_date_local") or a.get("start_date") or "")[:10]
+        if (first and day < first) or (last and day > last):
+            continue
+        selected.append(a)
+
+    routes = []
+    for members in cluster_routes(selected):
+        if len(members) < min_count or len(routes) >= limit:
+            break
+        summary = summarize_route(members)
+        routes.append(
+            FavouriteRoute(
+                name=summary["name"],
+                type=summary["type"],
+                count=summary["count"],
+                total_distance_km=_meters_to_km(summary["total_distance_m"]),
+                best_time_minutes=_seconds_to_minutes(summary["best_time_s"]) if summary["best_time_s"] else None,
+                best_activity_id=summary["best_activity_id"],
+                last_date=summary["last_date"],
+                start_latlng=list(summary["start"]) if summary["start"] else None,
+                summary_polyline=summary["summary_polyline"],
+                activity_ids=summary["activity_ids"],
+            )
+        )
+    return FavouriteRoutesResponse(routes=routes)
+
+
+def calendar_arrays(
+    day_index: DayIndex,
+    activity_type: str = "All",
+    start: Optional[datetime.date] = None,
+    end: Optional[datetime.date] = None,
+) -> Tuple[datetime.date, np.ndarray, np.ndarray, np.ndarray]:
+    """Dense per-day distance (km, float32), minutes (float32) and counts (uint8, capped at 255)."""
+    series = day_index.get(activity_type)
+    lo = min(max(day_index.offset(start), 0), day_index.days) if start else 0
+    hi = min(max(day_index.offset(end) + 1, lo), day_index.days) if end else day_index.days
+    window = slice(lo, hi)
+    return (
+        day_index.date_at(lo),
+        (series.distance[window] / 1000).astype("<f4"),
+        (series.moving_time[window] / 60).astype("<f4"),
+        np.minimum(series.count[window], 255).astype(np.uint8),
+    )
+
+
+def build_calendar(
+    day_index: DayIndex,
+    activity_type: str = "All",
+    start: Optional[datetime.date] = None,
+    end: Optional[datetime.date] = None,
+) -> CalendarResponse:
+    first, distance, minutes, counts = calendar_arrays(day_index, activity_type, start, end)
+
+    def encode(values: np.ndarray) -> str:
+        return base64.b64encode(values.tobytes()).decode("ascii")
+
+    return CalendarResponse(
+        start=first.isoformat(),
+        days=int(counts.size),
+        activity_type=activity_type,
+        distance_km=encode(distance),
+        moving_time_minutes=encode(minutes),
+        activities_count=encode(counts),
+    )
@@ -0,0 +1,169 @@
+import bisect
+import os
+import threading
+from typing import Any, Dict
+
+from athlete_store import (
+    drop_best_efforts,
+    load_activities,
+    load_tokens,
+    pending_activities,
+    save_athlete_later,
+    save_tokens,
+    store_enabled,
+)
+from cache import CACHE, remove_activity, sessions_for_athlete, upsert_activity
+from day_index import build_day_index
+from leaderboards import GROUPS
+from route_density import RouteDensity
+from strava_client import StravaError, ensure_fresh_token, fetch_activity
+from utils import simplify_activity
+
+WEBHOOK_VERIFY_TOKEN = os.getenv("STRAVA_WEBHOOK_VERIFY_TOKEN", "")
+# Id Strava returned when the push subscription was created; events for any other id are rejected.
+WEBHOOK_SUBSCRIPTION_ID = os.getenv("STRAVA_WEBHOOK_SUBSCRIPTION_ID", "")
+
+# Events for one athlete are applied one at a time so patches never interleave.
+_athlete_locks: Dict[int, threading.Lock] = {}
+_locks_guard = threading.Lock()
+
+
+def _athlete_lock(athlete_id: int) -> threading.Lock:
+    with _locks_guard:
+        return _athlete_locks.setdefault(athlete_id, threading.Lock())
+
+
+def is_subscribed_event(event: Dict[str, Any]) -> bool:
+    return bool(WEBHOOK_SUBSCRIPTION_ID) and str(event.get("subscription_id")) == WEBHOOK_SUBSCRIPTION_ID
+
+
+def _deauthorize(athlete_id: int) -> None:
+    for session_id in sessions_for_athlete(athlete_id):
+        CACHE[session_id]["tokens"] = None
+
+
+def _apply_activity(session_id: str, activity_id: int, activity: Dict[str, Any]) -> bool:
+    """Patch one session; returns True if the activity's stored best efforts are now stale."""
+    session = CACHE[session_id]
+    simplified = simplify_activity(activity)
+    previous = upsert_activity(session_id, simplified)
+    density = session.get("route_density")
+    if density is None:
+        density = session["route_density"] = RouteDensity()
+    stale = previous is not None and previous.get("summary_polyline") != simplified.get("summary_polyline")
+    if stale:
+        density.remove_activities([previous])
+        (session.get("best_efforts") or {}).pop(activity_id, None)
+    density.add_activities([simplified])
+    distributions = session.get("distributions")
+    if distributions is not None:
+        if previous is not None:
+            distributions.remove_activity(previous)
+        distributions.add_activity(simplified)
+    if session.get("search_index") is not None:
+        session["search_index"].add(simplified)
+    return stale
+
+
+def _drop_activity(session_id: str, activity_id: int) -> bool:
+    session = CACHE[session_id]
+    removed = remove_activity(session_id, activity_id)
+    if removed is None:
+        return False
+    if session.get("route_density") is not None:
+        session["route_density"].remove_activities([removed])
+    (session.get("best_efforts") or {}).pop(activity_id, None)
+    if session.get("distributions") is not None:
+        session["distributions"].remove_activity(removed)
+    if session.get("search_index") is not None:
+        session["search_index"].remove(activity_id)
+    return True
+
+
+def _apply_to_store(owner_id: int, object_id: int, aspect: str) -> None:
+    """Patch a logged-out group member's stored activities and leaderboard aggregate.
+
+    Deletes always apply; creates and updates need a fetch, so they only apply
+    when the member's tokens are kept in the athlete store.
+    """
+    activities = pending_activities(owner_id)
+    if activities is None:
+        activities = load_activities(owner_id)
+    tokens = None
+    activity = None
+    if aspect in ("create", "update"):
+        tokens = load_tokens(owner_id)
+        if not tokens:
+            return
+        try:
+            tokens = ensure_fresh_token(tokens)
+            activity = fetch_activity(tokens.get("access_token"), object_id, athlete_id=owner_id, revalidate=True)
+        except StravaError:
+            return
+        save_tokens(owner_id, tokens)
+    activities = [a for a in activities if a.get("id") != object_id]
+    if activity is not None:
+        bisect.insort(activities, simplify_activity(activity), key=lambda a: a.get("start_date") or "")
+    save_athlete_later(owner_id, tokens, activities)
+    drop_best_efforts(owner_id, [object_id])
+    GROUPS.update_athlete(owner_id, build_day_index(activities))
+
+
+def process_event(event: Dict[str, Any]) -> int:
+    """Apply one Strava webhook event to every session of its owner.
+
+    Returns the number of sessions patched. Create/update events fetch the single
+    activity once and reuse it across the athlete's sessions.
+    """
+    owner_id = event.get("owner_id")
+    object_id = event.get("object_id")
+    aspect = event.get("aspect_type")
+    if owner_id is None or object_id is None:
+        return 0
+
+    with _athlete_lock(owner_id):
+        if event.get("object_type") == "athlete":
+            if str((event.get("updates") or {}).get("authorized", "")).lower() == "false":
+                _deauthorize(owner_id)
+            return 0
+        if event.get("object_type") != "activity":
+            return 0
+
+        session_ids = [sid for sid in sessions_for_athlete(owner_id) if CACHE[sid].get("tokens")]
+        if not session_ids:
+            # Logged out: keep the member's leaderboard entry current from the store.
+            if store_enabled() and GROUPS.groups_for(owner_id):
+                _apply_to_store(owner_id, object_id, aspect)
+            return 0
+        activity = None
+        if aspect in ("create", "update"):
+            for session_id in session_ids:
+                try:
+                    tokens = ensure_fresh_token(CACHE[session_id]["tokens"])
+                    CACHE[session_id]["tokens"] = tokens
+                    # The event says the activity changed, so a cached copy must be rechecked.
+                    activity = fetch_activity(
+                        tokens.get("access_token"), object_id, athlete_id=owner_id, revalidate=True
+                    )
+                    break
+                except StravaError:
+                    continue
+            else:
+                return 0
+
+        efforts_stale = False
+        for session_id in session_ids:
+            if activity is None:
+                # Deleted, or no longer visible to us (e.g. made private).
+                efforts_stale |= _drop_activity(session_id, object_id)
+            else:
+                efforts_stale |= _apply_activity(session_id, object_id, activity)
+        session = CACHE[session_ids[0]]
+        save_athlete_later(owner_id, session.get("tokens"), session.get("activities") or [])
+        if efforts_stale:
+            drop_best_efforts(owner_id, [object_id])
+        if GROUPS.groups_for(owner_id):
+            if session.get("day_index") is None:
+                session["day_index"] = build_day_index(session.get("activities") or [])
+            GROUPS.update_athlete(owner_id, session["day_index"])
+        return len(session_ids)
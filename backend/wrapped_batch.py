@@ -0,0 +1,214 @@
+"""Precompute Wrapped snapshots for every stored athlete.
+
+    python wrapped_batch.py --workers 4 --types All Run Ride
+
+Athletes are processed in parallel across a process pool; each writes one
+snapshot per activity type under ``ATHLETE_STORE_DIR/wrapped/<year>/``, which
+``/api/wrapped`` serves while the athlete's activities are unchanged. Snapshots
+that already match the stored activities are skipped, so an interrupted run
+resumes where it stopped. Kudos lookups are the only Strava calls made; they
+are paced against a shared request budget so the batch leaves room for
+interactive traffic. They need stored tokens (``ATHLETE_STORE_TOKENS=1``);
+otherwise snapshots are marked partial and kudos are looked up when served.
+"""
+import argparse
+import sys
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional, Sequence, Tuple
+
+from athlete_store import (
+    ATHLETE_STORE_DIR,
+    load_activities,
+    load_meta,
+    load_tokens,
+    load_wrapped_snapshot,
+    save_tokens,
+    save_wrapped_snapshot,
+    stored_athlete_ids,
+    store_enabled,
+)
+from strava_client import StravaError, ensure_fresh_token
+from utils import compute_wrapped
+
+# compute_wrapped looks up kudos for at most this many activities per call.
+KUDOS_ACTIVITIES_PER_WRAPPED = 5
+FIFTEEN_MINUTES = 15 * 60
+ONE_DAY = 24 * 60 * 60
+
+
+class RateBudget:
+    """Blocking sliding-window budget for Strava calls (per 15 minutes and per day)."""
+
+    def __init__(self, per_window: int, per_day: int) -> None:
+        self.limits = [(FIFTEEN_MINUTES, per_window), (ONE_DAY, per_day)]
+        self._spent: Deque[Tuple[float, int]] = deque()
+        self._lock = threading.Lock()
+
+    def _used(self, now: float, window: float) -> int:
+        return sum(n for ts, n in self._spent if ts > now - window)
+
+    def reserve(self, calls: int) -> float:
+        """Block until ``calls`` fit in every window; returns seconds waited."""
+        calls = min(calls, *(limit for _, limit in self.limits))
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.time()
+                while self._spent and self._spent[0][0] <= now - ONE_DAY:
+                    self._spent.popleft()
+                blocked_until = 0.0
+                for window, limit in self.limits:
+                    if self._used(now, window) + calls > limit:
+                        oldest = next(ts for ts, _ in self._spent if ts > now - window)
+                        blocked_until = max(blocked_until, oldest + window)
+                if not blocked_until:
+                    self._spent.append((now, calls))
+                    return waited
+            pause = max(blocked_until - now, 0.5)
+            time.sleep(pause)
+            waited += pause
+
+
+def _pending_types(athlete_id: int, year: int, types: Sequence[str], force: bool) -> List[str]:
+    if force:
+        return list(types)
+    fingerprint = load_meta(athlete_id).get("fingerprint")
+    return [t for t in types if load_wrapped_snapshot(athlete_id, year, t, fingerprint) is None]
+
+
+def build_snapshots(athlete_id: int, year: int, types: Sequence[str], use_kudos: bool) -> Dict[str, Any]:
+    """Worker entry point: compute and persist one athlete's pending snapshots."""
+    activities = load_activities(athlete_id)
+    fingerprint = load_meta(athlete_id).get("fingerprint")
+    tokens = load_tokens(athlete_id) if use_kudos else None
+    if tokens:
+        try:
+            fresh = ensure_fresh_token(tokens)
+        except StravaError:
+            fresh = None
+        if fresh and fresh != tokens:
+            save_tokens(athlete_id, fresh)
+        tokens = fresh
+    for activity_type in types:
+        result = compute_wrapped(activities, activity_type=activity_type, tokens=tokens, year=year)
+        # Without tokens there are no kudos; /api/wrapped fills them in when serving.
+        save_wrapped_snapshot(
+            athlete_id, year, activity_type, fingerprint, result.dict(), kudos=bool(tokens)
+        )
+    return {"athlete_id": athlete_id, "snapshots": len(types), "kudos": bool(tokens)}
+
+
+def run_batch(
+    year: int,
+    types: Sequence[str],
+    workers: int = 2,
+    use_kudos: bool = True,
+    per_window: int = 80,
+    per_day: int = 800,
+    force: bool = False,
+    athlete_ids: Optional[Sequence[int]] = None,
+) -> Dict[str, int]:
+    ids = list(athlete_ids) if athlete_ids else stored_athlete_ids()
+    budget = RateBudget(per_window, per_day)
+    stats = {"athletes": len(ids), "built": 0, "skipped": 0, "failed": 0, "snapshots": 0}
+    started = time.perf_counter()
+    done = 0
+
+    def progress(athlete_id: int, status: str) -> None:
+        elapsed = time.perf_counter() - started
+        processed = stats["built"] + stats["failed"]
+        eta = elapsed / processed * (len(ids) - done) if processed else 0.0
+        print(f"[{done}/{len(ids)}] athlete {athlete_id}: {status} ({elapsed:.0f}s elapsed, ~{eta:.0f}s left)", flush=True)
+
+    pool = ProcessPoolExecutor(max_workers=workers)
+    in_flight: Dict[Future, int] = {}
+    try:
+        queue = iter(ids)
+        exhausted = False
+        while in_flight or not exhausted:
+            while not exhausted and len(in_flight) < workers * 2:
+                athlete_id = next(queue, None)
+                if athlete_id is None:
+                    exhausted = True
+                    break
+                pending = _pending_types(athlete_id, year, types, force)
+                if not pending:
+                    stats["skipped"] += 1
+                    done += 1
+                    progress(athlete_id, "up to date")
+                    continue
+                if use_kudos:
+                    waited = budget.reserve(KUDOS_ACTIVITIES_PER_WRAPPED * len(pending))
+                    if waited:
+                        print(f"rate budget reached, waited {waited:.0f}s", flush=True)
+                in_flight[pool.submit(build_snapshots, athlete_id, year, pending, use_kudos)] = athlete_id
+            if not in_flight:
+                continue
+            finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+            for future in finished:
+                athlete_id = in_flight.pop(future)
+                done += 1
+                try:
+                    result = future.result()
+                except Exception as exc:  # noqa: BLE001 - one bad athlete must not stop the batch
+                    stats["failed"] += 1
+                    progress(athlete_id, f"failed: {exc}")
+                    continue
+                stats["built"] += 1
+                stats["snapshots"] += result["snapshots"]
+                kudos_note = "" if result["kudos"] else ", no kudos"
+                progress(athlete_id, f"{result['snapshots']} snapshot(s){kudos_note}")
+    except KeyboardInterrupt:
+        print("interrupted; finished snapshots are kept, rerun to resume", flush=True)
+        pool.shutdown(wait=False, cancel_futures=True)
+        raise
+    pool.shutdown()
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--year", type=int, default=datetime.utcnow().year)
+    parser.add_argument("--types", nargs="+", default=["All"], help="Activity types to snapshot (default: All)")
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--athletes", type=int, nargs="+", help="Only these athlete ids")
+    parser.add_argument("--no-kudos", action="store_true", help="Skip kudos lookups (no Strava calls at all)")
+    parser.add_argument("--budget-15min", type=int, default=80, help="Strava calls allowed per 15 minutes")
+    parser.add_argument("--budget-day", type=int, default=800, help="Strava calls allowed per day")
+    parser.add_argument("--force", action="store_true", help="Rebuild snapshots that are already up to date")
+    args = parser.parse_args()
+
+    if not store_enabled():
+        parser.error("ATHLETE_STORE_DIR is empty; there are no stored athletes to process")
+    invalid = [t for t in args.types if not t.isalnum()]
+    if invalid:
+        parser.error(f"invalid activity types: {', '.join(invalid)}")
+    print(f"store {ATHLETE_STORE_DIR}, year {args.year}, types {' '.join(args.types)}, {args.workers} workers", flush=True)
+    try:
+        stats = run_batch(
+            args.year,
+            args.types,
+            workers=args.workers,
+            use_kudos=not args.no_kudos,
+            per_window=args.budget_15min,
+            per_day=args.budget_day,
+            force=args.force,
+            athlete_ids=args.athletes,
+        )
+    except KeyboardInterrupt:
+        sys.exit(130)
+    print(
+        f"done: {stats['built']} built ({stats['snapshots']} snapshots), "
+        f"{stats['skipped']} up to date, {stats['failed']} failed of {stats['athletes']} athletes",
+        flush=True,
+    )
+    if stats["failed"]:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -83,6 +83,19 @@ export interface WrappedActivity {
   strava_url: string
 }
 
+export interface FavouriteRoute {
+  name: string
+  type: string
+  count: number
+  total_distance_km: number
+  best_time_minutes?: number | null
+  best_activity_id?: number | null
+  last_date: string
+  start_latlng?: number[] | null
+  summary_polyline?: string | null
+  activity_ids: number[]
+}
+
 export interface HeatmapPoint {
   lat: number
   lng: number
@@ -106,9 +119,22 @@ export interface WrappedResponse {
   most_kudos_activity?: WrappedActivity | null
   top_kudos_givers: { name: string; count: number }[]
   favourite_partners: { name: string; activity_count?: number; count?: number }[]
+  favourite_routes?: FavouriteRoute[]
   cumulative_distance: { date: string; distance_km: number; cumulative_distance_km: number }[]
   monthly_distance: { month: string; distance_km: number }[]
   time_of_day_distribution: { label: string; count: number }[]
   heatmap_points: HeatmapPoint[]
   fun_lines: string[]
 }
+
+// Typed arrays with one value per day from `start`, base64-encoded:
+// float32 (little-endian) distance_km and moving_time_minutes, uint8 counts.
+export interface CalendarResponse {
+  start: string
+  days: number
+  activity_type: string
+  encoding: 'base64'
+  distance_km: string
+  moving_time_minutes: string
+  activities_count: string
+}